@@ -5,71 +5,189 @@
 
 # Version number: 0.0.0
 
+from collections import namedtuple
+
+from output_sink import TerminalSink, FLUSH_ON_INPUT, FLUSH_ON_FRAME, FLUSH_ON_END
 
 EMPTY_STRING = ""
 HI_MEM = 20
 MAX_INT = 127  # 8 bits available for operand (two's complement integer)
+MIN_INT = -128
+WORD_SIZE = 8
+WORD_MASK = 255
+POLICY_TRAP = "TRAP"
+POLICY_WRAP = "WRAP"
+POLICY_SATURATE = "SATURATE"
+OVERFLOW_POLICY = POLICY_TRAP
+STATUS_LABEL = "ZNV"  # "ZNVC" adds a carry flag, "ZNVP" an even parity flag
+FLAG_Z = 4
+FLAG_N = 2
+FLAG_V = 1
+FLAG_OVERFLOW = FLAG_V
+FLAG_PARITY = 0
 PC = 0
 ACC = 1
 STATUS = 2
 TOS = 3
 ERR = 4
+STACK_LIMIT = 5
+MAX_DEPTH = 6
+NUMBER_OF_REGISTERS = 7
+ERROR_OVERFLOW = 1
+ERROR_STACK_OVERFLOW = 2
+ERROR_STACK_UNDERFLOW = 3
+ERROR_STEP_LIMIT = 4
+ERROR_ADDRESS = 5
+ERROR_ASSEMBLY = 6  # the program could not be loaded or assembled
+STEP_LIMIT = 100000
+VIEWPORT_SIZE = 10  # rows of the listing shown around the PC in viewport mode
+STACK_SIZE = None  # None lets the stack grow down through all of memory
+PROTECT_PROGRAM = False  # True stops the stack growing into program and data cells
+ADDRESS_NONE = "NONE"
+ADDRESS_IMMEDIATE = "IMMEDIATE"
+ADDRESS_DIRECT = "DIRECT"
+FLOW_NEXT = "NEXT"
+FLOW_JUMP = "JUMP"
+FLOW_BRANCH = "BRANCH"
+FLOW_CALL = "CALL"
+FLOW_RETURN = "RETURN"
+FLOW_HALT = "HALT"
+ACCESS_NONE = "NONE"
+ACCESS_READ = "READ"
+ACCESS_WRITE = "WRITE"
+OPCODES = {}  # mnemonic -> OpCodeDefinition, filled by RegisterOpCode
+OPCODE_HANDLERS = {}
+OPCODE_NAMES = frozenset()
+ADDRESS_OPCODES = set()
+Output = TerminalSink()
+
+
+Frame = namedtuple("Frame", ["FrameNumber", "Address", "OpCode", "Operand", "Registers", "ChangedAddress",
+                             "ChangedValue"])
+
+
+class ListingCache:
+    __slots__ = ("Rows", "RowAddresses", "ChangedRows")
+
+    def __init__(self):
+        self.Rows = []
+        self.RowAddresses = {}
+        self.ChangedRows = []
+
+
+class ListingViewport:
+    __slots__ = ("WindowSize", "PinnedAddresses", "LineMapped")
+
+    def __init__(self, WindowSize=VIEWPORT_SIZE, PinnedAddresses=(), LineMapped=False):
+        self.WindowSize = WindowSize
+        self.PinnedAddresses = sorted(PinnedAddresses)
+        self.LineMapped = LineMapped
+
+
+class OpCodeDefinition:
+    __slots__ = ("Mnemonic", "AddressMode", "Handler", "Flow", "MemoryAccess", "ChangesAcc", "ValidateOperand")
+
+    def __init__(self, Mnemonic, AddressMode, Handler, Flow, MemoryAccess, ChangesAcc, ValidateOperand):
+        self.Mnemonic = Mnemonic
+        self.AddressMode = AddressMode
+        self.Handler = Handler
+        self.Flow = Flow
+        self.MemoryAccess = MemoryAccess
+        self.ChangesAcc = ChangesAcc
+        self.ValidateOperand = ValidateOperand
 
 
 class AssemblerInstruction:
+    __slots__ = ("OpCode", "OperandString", "OperandValue", "StackPointerValue")
+
     def __init__(self):
         self.OpCode = EMPTY_STRING
         self.OperandString = EMPTY_STRING
         self.OperandValue = 0
         self.StackPointerValue = 0
 
+def SetOutputSink(Sink):
+    global Output
+    PreviousSink = Output
+    PreviousSink.Flush()
+    Output = Sink
+    return PreviousSink
+
+
+def GetInput(Prompt):
+    Output.FlushAt(FLUSH_ON_INPUT)
+    return input(Prompt)
+
+
 def DisplayMenu():
-    print()
-    print("Main Menu")
-    print("=========")
-    print("L - Load a program file")
-    print("D - Display source code")
-    print("E - Edit source code")
-    print("A - Assemble program")
-    print("R - Run the program")
-    print("X - Exit simulator")
-    print()
+    Output.Print()
+    Output.Print("Main Menu")
+    Output.Print("=========")
+    Output.Print("L - Load a program file")
+    Output.Print("D - Display source code")
+    Output.Print("E - Edit source code")
+    Output.Print("A - Assemble program")
+    Output.Print("R - Run the program")
+    Output.Print("X - Exit simulator")
+    Output.Print()
 
 
 def GetMenuOption():
     Choice = EMPTY_STRING
     while len(Choice) != 1:
-        Choice = input("Enter your choice: ")
+        Choice = GetInput("Enter your choice: ")
     return Choice[0]
 
 
+def CreateSourceCode(Size=HI_MEM):
+    return [EMPTY_STRING for Lines in range(Size)]
+
+
+def CreateMemory(Size=HI_MEM):
+    return [AssemblerInstruction() for Lines in range(Size)]
+
+
 def ResetSourceCode(SourceCode):
-    for LineNumber in range(HI_MEM):
+    for LineNumber in range(len(SourceCode)):
         SourceCode[LineNumber] = EMPTY_STRING
     return SourceCode
 
 
 def ResetMemory(Memory):
-    for LineNumber in range(HI_MEM):
+    for LineNumber in range(len(Memory)):
         Memory[LineNumber].OpCode = EMPTY_STRING
         Memory[LineNumber].OperandString = EMPTY_STRING
         Memory[LineNumber].OperandValue = 0
     return Memory
 
 
+def CopyMemory(Memory):
+    NewMemory = CreateMemory(len(Memory))
+    for Location in range(len(Memory)):
+        NewMemory[Location].OpCode = Memory[Location].OpCode
+        NewMemory[Location].OperandString = Memory[Location].OperandString
+        NewMemory[Location].OperandValue = Memory[Location].OperandValue
+        NewMemory[Location].StackPointerValue = Memory[Location].StackPointerValue
+    return NewMemory
+
+
 def DisplaySourceCode(SourceCode):
-    print()
+    Output.Print()
     NumberOfLines = int(SourceCode[0])
     for LineNumber in range(0, NumberOfLines + 1):
-        print("{:>2d} {:<40s}".format(LineNumber, SourceCode[LineNumber]))
-    print()
+        Output.Print("{:>2d} {:<40s}".format(LineNumber, SourceCode[LineNumber]))
+    Output.Print()
 
 
 def LoadFile(SourceCode):
+    FileName = GetInput("Enter filename to load: ")
+    return ReadSourceFile(SourceCode, FileName)
+
+
+def ReadSourceFile(SourceCode, FileName):
     FileExists = False
     SourceCode = ResetSourceCode(SourceCode)
     LineNumber = 0
-    FileName = input("Enter filename to load: ")
     try:
         FileIn = open(FileName + ".txt", 'r')
         FileExists = True
@@ -82,79 +200,101 @@ def LoadFile(SourceCode):
         SourceCode[0] = str(LineNumber)
     except:
         if not FileExists:
-            print("Error Code 1")
+            Output.Print("Error Code 1")
         else:
-            print("Error Code 2")
+            Output.Print("Error Code 2")
             SourceCode[0] = str(LineNumber - 1)
     if LineNumber > 0:
         DisplaySourceCode(SourceCode)
     return SourceCode
 
 
+def ReadSourceText(SourceCode, Text):
+    SourceCode = ResetSourceCode(SourceCode)
+    Lines = Text.splitlines()
+    if len(Lines) >= len(SourceCode):
+        Output.Print("Error Code 2")
+    else:
+        for LineNumber in range(len(Lines)):
+            SourceCode[LineNumber + 1] = Lines[LineNumber]
+        SourceCode[0] = str(len(Lines))
+    return SourceCode
+
+
 def EditSourceCode(SourceCode):
-    LineNumber = int(input("Enter line number of code to edit: "))
-    print(SourceCode[LineNumber])
+    LineNumber = int(GetInput("Enter line number of code to edit: "))
+    Output.Print(SourceCode[LineNumber])
     Choice = EMPTY_STRING
     while Choice != "C":
         Choice = EMPTY_STRING
         while Choice != "E" and Choice != "C":
-            print("E - Edit this line")
-            print("C - Cancel edit")
-            Choice = input("Enter your choice: ")
+            Output.Print("E - Edit this line")
+            Output.Print("C - Cancel edit")
+            Choice = GetInput("Enter your choice: ")
         if Choice == "E":
-            SourceCode[LineNumber] = input("Enter the new line: ")
+            SourceCode[LineNumber] = GetInput("Enter the new line: ")
         DisplaySourceCode(SourceCode)
     return SourceCode
 
 
 def UpdateSymbolTable(SymbolTable, ThisLabel, LineNumber):
     if ThisLabel in SymbolTable:
-        print("Error Code 3")
+        Output.Print("Error Code 3")
     else:
         SymbolTable[ThisLabel] = LineNumber
     return SymbolTable
 
 
-def ExtractLabel(Instruction, LineNumber, Memory, SymbolTable):
-    if len(Instruction) > 0:
-        ThisLabel = Instruction[0:5]
-        ThisLabel = ThisLabel.strip()
-        if ThisLabel != EMPTY_STRING:
-            if Instruction[5] != ':':
-                print("Error Code 4")
-                Memory[0].OpCode = "ERR"
-            else:
-                SymbolTable = UpdateSymbolTable(SymbolTable, ThisLabel, LineNumber)
+def ParseSourceLine(Instruction):
+    # columns: label 0-4, ':' at 5, opcode 7-9, '#' at 10, operand from 12 up to the last '*'
+    Length = len(Instruction)
+    Operation = None
+    Operand = None
+    if Length > 9:
+        Operation = Instruction[7:10]
+        if Instruction[10:11] == '#':
+            Operation += '#'
+        if Length >= 13:
+            Operand = Instruction[12:]
+            CommentStart = Operand.rfind('*')
+            if CommentStart >= 0:
+                Operand = Operand[:CommentStart]
+            Operand = Operand.strip()
+    return Instruction[0:5].strip(), Instruction[5:6] == ':', Operation, Operand
+
+
+def StoreLabel(ThisLabel, HasColon, LineNumber, Memory, SymbolTable):
+    if ThisLabel != EMPTY_STRING:
+        if not HasColon:
+            Output.Print("Error Code 4")
+            Memory[0].OpCode = "ERR"
+        else:
+            SymbolTable = UpdateSymbolTable(SymbolTable, ThisLabel, LineNumber)
     return SymbolTable, Memory
 
 
-def ExtractOpCode(Instruction, LineNumber, Memory):
-    if len(Instruction) > 9:
-        OpCodeValues = ["LDA", "STA", "LDA#", "HLT", "ADD", "JMP", "SUB", "CMP#", "BEQ", "SKP", "JSR", "RTN", "   "]
-        Operation = Instruction[7:10]
-        if len(Instruction) > 10:
-            AddressMode = Instruction[10:11]
-            if AddressMode == '#':
-                Operation += AddressMode
-        if Operation in OpCodeValues:
-            Memory[LineNumber].OpCode = Operation
-        else:
-            if Operation != EMPTY_STRING:
-                print("Error Code 5")
-                Memory[0].OpCode = "ERR"
+def StoreOpCode(Operation, LineNumber, Memory):
+    if Operation in OPCODE_NAMES:
+        Memory[LineNumber].OpCode = Operation
+    elif Operation is not None and Operation != EMPTY_STRING:
+        Output.Print("Error Code 5")
+        Memory[0].OpCode = "ERR"
     return Memory
 
 
+def ExtractLabel(Instruction, LineNumber, Memory, SymbolTable):
+    ThisLabel, HasColon, Operation, Operand = ParseSourceLine(Instruction)
+    return StoreLabel(ThisLabel, HasColon, LineNumber, Memory, SymbolTable)
+
+
+def ExtractOpCode(Instruction, LineNumber, Memory):
+    ThisLabel, HasColon, Operation, Operand = ParseSourceLine(Instruction)
+    return StoreOpCode(Operation, LineNumber, Memory)
+
+
 def ExtractOperand(Instruction, LineNumber, Memory):
-    if len(Instruction) >= 13:
-        Operand = Instruction[12:]
-        ThisPosition = -1
-        for Position in range(len(Operand)):
-            if Operand[Position] == '*':
-                ThisPosition = Position
-        if ThisPosition >= 0:
-            Operand = Operand[:ThisPosition]
-        Operand = Operand.strip()
+    ThisLabel, HasColon, Operation, Operand = ParseSourceLine(Instruction)
+    if Operand is not None:
         Memory[LineNumber].OperandString = Operand
     return Memory
 
@@ -162,10 +302,13 @@ def ExtractOperand(Instruction, LineNumber, Memory):
 def PassOne(SourceCode, Memory, SymbolTable):
     NumberOfLines = int(SourceCode[0])
     for LineNumber in range(1, NumberOfLines + 1):
-        Instruction = SourceCode[LineNumber]
-        SymbolTable, Memory = ExtractLabel(Instruction, LineNumber, Memory, SymbolTable)
-        Memory = ExtractOpCode(Instruction, LineNumber, Memory)
-        Memory = ExtractOperand(Instruction, LineNumber, Memory)
+        ThisLabel, HasColon, Operation, Operand = ParseSourceLine(SourceCode[LineNumber])
+        if ThisLabel != EMPTY_STRING:
+            SymbolTable, Memory = StoreLabel(ThisLabel, HasColon, LineNumber, Memory, SymbolTable)
+        if Operation is not None:
+            Memory = StoreOpCode(Operation, LineNumber, Memory)
+            if Operand is not None:
+                Memory[LineNumber].OperandString = Operand
     return Memory, SymbolTable
 
 
@@ -181,31 +324,148 @@ def PassTwo(Memory, SymbolTable, NumberOfLines):
                     OperandValue = int(Operand)
                     Memory[LineNumber].OperandValue = OperandValue
                 except:
-                    print("Error Code 6")
+                    Output.Print("Error Code 6")
+                    Memory[0].OpCode = "ERR"
+                    continue
+            Definition = OPCODES.get(Memory[LineNumber].OpCode)
+            if Definition is not None and Definition.ValidateOperand is not None:
+                if not Definition.ValidateOperand(OperandValue, Memory):
+                    Output.Print("Error Code 12")
                     Memory[0].OpCode = "ERR"
     return Memory
 
 
-def DisplayMemoryLocation(Memory, Location):
-    print("*  {:<5s}{:<5d} |".format(Memory[Location].OpCode, Memory[Location].OperandValue), end='')
+def FormatMemoryLocation(Memory, Location):
+    return "*  {:<5s}{:<5d} |".format(Memory[Location].OpCode, Memory[Location].OperandValue)
 
 
-def DisplaySourceCodeLine(SourceCode, Location):
-    print(" {:>3d}  |  {:<40s}".format(Location, SourceCode[Location]))
+def FormatSourceCodeLine(SourceCode, Location):
+    return " {:>3d}  |  {:<40s}".format(Location, SourceCode[Location])
+
+
+def DisplayMemoryLocation(Memory, Location):
+    Output.Print(FormatMemoryLocation(Memory, Location), End='')
 
 
-def DisplayCode(SourceCode, Memory):
-    print("*  Memory     Location  Label  Op   Operand Comment")
-    print("*  Contents                    Code")
+def DisplaySourceCodeLine(SourceCode, Location):
+    Output.Print(FormatSourceCodeLine(SourceCode, Location))
+
+
+def DisplayCode(SourceCode, Memory, PcMap=None):
+    DisplayCachedCode(CreateListingCache(SourceCode, Memory, PcMap))
+
+
+def CreateListingViewport(WindowSize=VIEWPORT_SIZE, PinnedLabels=(), SymbolTable=None, LineMap=None, PcMap=None):
+    if WindowSize < 1:
+        raise ValueError("Viewport must show at least one row")
+    if (LineMap is None) != (PcMap is None):
+        raise ValueError("LineMap and PcMap must be given together")
+    PinnedAddresses = []
+    for Label in PinnedLabels:
+        if SymbolTable is None or Label not in SymbolTable:
+            raise ValueError("Unknown label " + str(Label))
+        Address = SymbolTable[Label]
+        if LineMap is not None:
+            Address = LineMap.get(Address, len(PcMap))
+            if Address >= len(PcMap) or PcMap[Address] != SymbolTable[Label]:
+                raise ValueError("Label " + str(Label) + " was removed from the optimised program")
+        PinnedAddresses.append(Address)
+    return ListingViewport(WindowSize, PinnedAddresses, LineMap is not None)
+
+
+def FormatListingRow(SourceCode, Memory, Address, PcMap=None):
+    if Address == 0:
+        return FormatMemoryLocation(Memory, 0) + "   0  |"
+    return FormatMemoryLocation(Memory, Address) + FormatSourceCodeLine(SourceCode, MapToSourceLine(PcMap, Address))
+
+
+def GetViewportRange(SourceCode, Registers, Viewport, PcMap=None):
+    LastAddress = int(SourceCode[0])
+    if PcMap is not None:
+        LastAddress = len(PcMap) - 1
+    First = max(0, min(Registers[PC] - Viewport.WindowSize // 2, LastAddress + 1 - Viewport.WindowSize))
+    return range(First, min(LastAddress, First + Viewport.WindowSize - 1) + 1)
+
+
+def DisplayViewport(SourceCode, Memory, Registers, Viewport, PcMap=None):
+    if len(Viewport.PinnedAddresses) > 0 and Viewport.LineMapped != (PcMap is not None):
+        raise ValueError("Pinned rows must be mapped with the LineMap of the program being displayed")
+    Window = GetViewportRange(SourceCode, Registers, Viewport, PcMap)
+    Output.Print("*  Memory     Location  Label  Op   Operand Comment")
+    Output.Print("*  Contents                    Code")
+    for Address in Viewport.PinnedAddresses:
+        if Address not in Window:
+            Output.Print(FormatListingRow(SourceCode, Memory, Address, PcMap))
+    if Registers[TOS] < len(Memory):
+        StackTop = Memory[Registers[TOS]].StackPointerValue
+        Output.Print("*  {:<5s}{:<5d} | {:>3d}  |".format("TOS", StackTop, Registers[TOS]))
+    Output.Print("*  ...")
+    for Address in Window:
+        Row = FormatListingRow(SourceCode, Memory, Address, PcMap)
+        if Address == Registers[PC]:
+            Row = "*> " + Row[3:]
+        Output.Print(Row)
+
+
+def MapToSourceLine(PcMap, Address):
+    if PcMap is not None and 0 <= Address < len(PcMap):
+        return PcMap[Address]
+    return Address
+
+
+def CreateListingCache(SourceCode, Memory, PcMap=None):
+    Cache = ListingCache()
     NumberOfLines = int(SourceCode[0])
-    DisplayMemoryLocation(Memory, 0)
-    print("   0  |")
+    Cache.Rows.append(FormatMemoryLocation(Memory, 0) + "   0  |")
+    Cache.RowAddresses[0] = 0
+    MemoryAddresses = {}
     for Location in range(1, NumberOfLines + 1):
-        DisplayMemoryLocation(Memory, Location)
-        DisplaySourceCodeLine(SourceCode, Location)
+        MemoryAddresses[Location] = Location
+    if PcMap is not None:
+        MemoryAddresses = {}
+        for Address in range(len(PcMap)):
+            MemoryAddresses[PcMap[Address]] = Address
+    for Location in range(1, NumberOfLines + 1):
+        if Location in MemoryAddresses:
+            Address = MemoryAddresses[Location]
+            Cache.RowAddresses[Address] = Location
+            Cache.Rows.append(FormatMemoryLocation(Memory, Address) + FormatSourceCodeLine(SourceCode, Location))
+        else:
+            Cache.Rows.append("*  ---        |" + FormatSourceCodeLine(SourceCode, Location))
+    return Cache
+
+
+def UpdateListingCache(Cache, SourceCode, Memory, Address):
+    if Address in Cache.RowAddresses:
+        Location = Cache.RowAddresses[Address]
+        if Location == 0:
+            Cache.Rows[0] = FormatMemoryLocation(Memory, 0) + "   0  |"
+        else:
+            Cache.Rows[Location] = FormatMemoryLocation(Memory, Address) + FormatSourceCodeLine(SourceCode, Location)
+        Cache.ChangedRows.append(Location)
+    return Cache
+
+
+def DisplayCachedCode(Cache):
+    Output.Print("*  Memory     Location  Label  Op   Operand Comment")
+    Output.Print("*  Contents                    Code")
+    for Row in Cache.Rows:
+        Output.Print(Row)
+    Cache.ChangedRows = []
+
+
+def DisplayChangedRows(Cache):
+    for Location in Cache.ChangedRows:
+        Output.Print(Cache.Rows[Location])
+    Cache.ChangedRows = []
 
 
 def Assemble(SourceCode, Memory):
+    Memory, SymbolTable = AssembleWithSymbols(SourceCode, Memory)
+    return Memory
+
+
+def AssembleWithSymbols(SourceCode, Memory):
     Memory = ResetMemory(Memory)
     NumberOfLines = int(SourceCode[0])
     SymbolTable = {}
@@ -217,17 +477,30 @@ def Assemble(SourceCode, Memory):
         else:
             Memory[0].OperandValue = 1
         Memory = PassTwo(Memory, SymbolTable, NumberOfLines)
-    return Memory
+    return Memory, SymbolTable
+
 
+def LoadAndAssemble(FileName, MemorySize=HI_MEM):
+    SourceCode = ReadSourceFile(CreateSourceCode(MemorySize), FileName)
+    Memory = CreateMemory(MemorySize)
+    SymbolTable = {}
+    if SourceCode[0] == EMPTY_STRING:
+        Memory[0].OpCode = "ERR"
+    else:
+        Memory, SymbolTable = AssembleWithSymbols(SourceCode, Memory)
+        if Memory[0].OpCode == "ERR":
+            Output.Print("Error Code 11")
+    return SourceCode, Memory, SymbolTable
 
-def ConvertToBinary(DecimalNumber):
+
+def ConvertToBinary(DecimalNumber, Width=3):
     BinaryString = EMPTY_STRING
     while DecimalNumber > 0:
         Remainder = DecimalNumber % 2
         Bit = str(Remainder)
         BinaryString = Bit + BinaryString
         DecimalNumber = DecimalNumber // 2
-    while len(BinaryString) < 3:
+    while len(BinaryString) < Width:
         BinaryString = '0' + BinaryString
     return BinaryString
 
@@ -242,36 +515,105 @@ def ConvertToDecimal(BinaryString):
 
 def DisplayFrameDelimiter(FrameNumber):
     if FrameNumber == -1:
-        print("***************************************************************")
+        Output.Print("***************************************************************")
     else:
-        print("****** Frame", FrameNumber, "************************************************")
+        Output.Print("****** Frame", FrameNumber, "************************************************")
 
 
-def DisplayCurrentState(SourceCode, Memory, Registers):
-    print("*")
-    DisplayCode(SourceCode, Memory)
-    print("*")
-    print("*  PC: ", Registers[PC], " ACC: ", Registers[ACC], " TOS: ", Registers[TOS])
-    print("*  Status Register: ZNV")
-    print("*                  ", ConvertToBinary(Registers[STATUS]))
+def DisplayRegisters(Registers, PcMap=None):
+    Output.Print("*  PC: ", MapToSourceLine(PcMap, Registers[PC]), " ACC: ", Registers[ACC], " TOS: ", Registers[TOS])
+    Output.Print("*  Status Register:", STATUS_LABEL)
+    Output.Print("*                  ", ConvertToBinary(Registers[STATUS], len(STATUS_LABEL)))
     DisplayFrameDelimiter(-1)
 
 
+def DisplayCurrentState(SourceCode, Memory, Registers, PcMap=None, Viewport=None):
+    Output.Print("*")
+    if Viewport is None:
+        DisplayCode(SourceCode, Memory, PcMap)
+    else:
+        DisplayViewport(SourceCode, Memory, Registers, Viewport, PcMap)
+    Output.Print("*")
+    DisplayRegisters(Registers, PcMap)
+
+
+def DisplayCachedState(Cache, Registers, PcMap=None, DiffOnly=False):
+    Output.Print("*")
+    if DiffOnly:
+        DisplayChangedRows(Cache)
+    else:
+        DisplayCachedCode(Cache)
+    Output.Print("*")
+    DisplayRegisters(Registers, PcMap)
+
+
+def ConfigureArithmetic(WordSize=8, OverflowPolicy=POLICY_TRAP, StatusLabel="ZNV"):
+    global MAX_INT, MIN_INT, WORD_SIZE, WORD_MASK, OVERFLOW_POLICY, STATUS_LABEL
+    global FLAG_Z, FLAG_N, FLAG_V, FLAG_OVERFLOW, FLAG_PARITY
+    if WordSize not in (8, 16, 32):
+        raise ValueError("Word size must be 8, 16 or 32 bits")
+    if OverflowPolicy not in (POLICY_TRAP, POLICY_WRAP, POLICY_SATURATE):
+        raise ValueError("Unknown overflow policy " + str(OverflowPolicy))
+    if StatusLabel not in ("ZNV", "ZNVC", "ZNVP"):
+        raise ValueError("Unknown status register layout " + str(StatusLabel))
+    WORD_SIZE = WordSize
+    WORD_MASK = (1 << WordSize) - 1
+    MAX_INT = (1 << (WordSize - 1)) - 1
+    MIN_INT = -(MAX_INT + 1)
+    OVERFLOW_POLICY = OverflowPolicy
+    STATUS_LABEL = StatusLabel
+    FlagCount = len(StatusLabel)
+    FLAG_Z = 1 << (FlagCount - 1)
+    FLAG_N = 1 << (FlagCount - 2)
+    FLAG_V = 1 << (FlagCount - 3)
+    FLAG_OVERFLOW = FLAG_V
+    FLAG_PARITY = 0
+    if StatusLabel == "ZNVC":
+        FLAG_OVERFLOW = FLAG_V | 1
+    elif StatusLabel == "ZNVP":
+        FLAG_PARITY = 1
+
+
+def WrapToWord(Value):
+    return ((Value - MIN_INT) & WORD_MASK) + MIN_INT
+
+
 def SetFlags(Value, Registers):
-    if Value == 0:
-        Registers[STATUS] = ConvertToDecimal("100")
+    if Value > MAX_INT or Value < MIN_INT:
+        Status = FLAG_OVERFLOW
+    elif Value == 0:
+        Status = FLAG_Z
     elif Value < 0:
-        Registers[STATUS] = ConvertToDecimal("010")
-    elif Value > MAX_INT or Value < -(MAX_INT + 1):
-        Registers[STATUS] = ConvertToDecimal("001")
+        Status = FLAG_N
     else:
-        Registers[STATUS] = ConvertToDecimal("000")
+        Status = 0
+    if FLAG_PARITY and bin(Registers[ACC] & WORD_MASK).count("1") % 2 == 0:
+        Status = Status | FLAG_PARITY
+    Registers[STATUS] = Status
     return Registers
 
 
-def ReportRunTimeError(ErrorMessage, Registers):
-    print("Run time error:", ErrorMessage)
-    Registers[ERR] = 1
+def SetArithmeticResult(Value, Registers):
+    if MIN_INT <= Value <= MAX_INT or OVERFLOW_POLICY == POLICY_TRAP:
+        Registers[ACC] = Value
+        Registers = SetFlags(Value, Registers)
+        if Registers[STATUS] & FLAG_V:
+            Registers = ReportRunTimeError("Overflow", Registers)
+    else:
+        if OVERFLOW_POLICY == POLICY_WRAP:
+            Registers[ACC] = WrapToWord(Value)
+        elif Value > MAX_INT:
+            Registers[ACC] = MAX_INT
+        else:
+            Registers[ACC] = MIN_INT
+        Registers = SetFlags(Registers[ACC], Registers)
+        Registers[STATUS] = Registers[STATUS] | FLAG_OVERFLOW
+    return Registers
+
+
+def ReportRunTimeError(ErrorMessage, Registers, ErrorCode=ERROR_OVERFLOW):
+    Output.Print("Run time error:", ErrorMessage)
+    Registers[ERR] = ErrorCode
     return Registers
 
 
@@ -293,18 +635,12 @@ def ExecuteLDAimm(Registers, Operand):
 
 
 def ExecuteADD(Memory, Registers, Address):
-    Registers[ACC] = Registers[ACC] + Memory[Address].OperandValue
-    Registers = SetFlags(Registers[ACC], Registers)
-    if Registers[STATUS] == ConvertToDecimal("001"):
-        ReportRunTimeError("Overflow", Registers)
+    Registers = SetArithmeticResult(Registers[ACC] + Memory[Address].OperandValue, Registers)
     return Registers
 
 
 def ExecuteSUB(Memory, Registers, Address):
-    Registers[ACC] = Registers[ACC] - Memory[Address].OperandValue
-    Registers = SetFlags(Registers[ACC], Registers)
-    if Registers[STATUS] == ConvertToDecimal("001"):
-        ReportRunTimeError("Overflow", Registers)
+    Registers = SetArithmeticResult(Registers[ACC] - Memory[Address].OperandValue, Registers)
     return Registers
 
 
@@ -315,9 +651,7 @@ def ExecuteCMPimm(Registers, Operand):
 
 
 def ExecuteBEQ(Registers, Address):
-    StatusRegister = ConvertToBinary(Registers[STATUS])
-    FlagZ = StatusRegister[0]
-    if FlagZ == "1":
+    if Registers[STATUS] & FLAG_Z:
         Registers[PC] = Address
     return Registers
 
@@ -331,79 +665,256 @@ def ExecuteSKP():
     return
 
 
+def GetStackContents(Memory, Registers):
+    return [Memory[Index].StackPointerValue for Index in range(Registers[TOS], len(Memory))]
+
+
 def DisplayStack(Memory, Registers):
-    print("Stack contents:")
-    print(" ----")
-    for Index in range(Registers[TOS], HI_MEM):
-        print("|{:>3d} |".format(Memory[Index].OperandValue))
-    print(" ----")
+    Output.Print("Stack contents:")
+    Output.Print(" ----")
+    for Index in range(Registers[TOS], len(Memory)):
+        Output.Print("|{:>3d} |".format(Memory[Index].OperandValue))
+    Output.Print(" ----")
 
 
 def ExecuteJSR(Memory, Registers, Address):
     StackPointer = Registers[TOS] - 1
+    if StackPointer < Registers[STACK_LIMIT]:
+        Registers = ReportRunTimeError("Stack overflow", Registers, ERROR_STACK_OVERFLOW)
+        return Memory, Registers
     Memory[StackPointer].StackPointerValue = Registers[PC]
     Registers[PC] = Address
     Registers[TOS] = StackPointer
-    DisplayStack(Memory, Registers)
+    if len(Memory) - StackPointer > Registers[MAX_DEPTH]:
+        Registers[MAX_DEPTH] = len(Memory) - StackPointer
     return Memory, Registers
 
 
 def ExecuteRTN(Memory, Registers):
     StackPointer = Registers[TOS]
+    if StackPointer >= len(Memory):
+        return ReportRunTimeError("Stack underflow", Registers, ERROR_STACK_UNDERFLOW)
     Registers[TOS] += 1
     Registers[PC] = Memory[StackPointer].StackPointerValue
     return Registers
 
 
-def Execute(SourceCode, Memory):
-    Registers = [0, 0, 0, 0, 0]
+def InitialiseRegisters(MemorySize=HI_MEM, StackLimit=0):
+    Registers = [0 for Register in range(NUMBER_OF_REGISTERS)]
     Registers = SetFlags(Registers[ACC], Registers)
     Registers[PC] = 0
-    Registers[TOS] = HI_MEM
+    Registers[TOS] = MemorySize
+    Registers[STACK_LIMIT] = StackLimit
+    return Registers
+
+
+def FindProgramEnd(Memory):
+    ProgramEnd = len(Memory)
+    while ProgramEnd > 0 and Memory[ProgramEnd - 1].OpCode == EMPTY_STRING:
+        ProgramEnd -= 1
+    return ProgramEnd
+
+
+def ConfigureStack(StackSize=None, ProtectProgram=False):
+    global STACK_SIZE, PROTECT_PROGRAM
+    STACK_SIZE = StackSize
+    PROTECT_PROGRAM = ProtectProgram
+
+
+def ResetRegisters(Memory):
+    StackLimit = 0
+    if STACK_SIZE is not None:
+        StackLimit = max(0, len(Memory) - STACK_SIZE)
+    if PROTECT_PROGRAM:
+        StackLimit = max(StackLimit, FindProgramEnd(Memory))
+    return InitialiseRegisters(len(Memory), StackLimit)
+
+
+def GetStackDepth(Memory, Registers):
+    return len(Memory) - Registers[TOS]
+
+
+def IsAddress(Operand, Memory):
+    return 0 <= Operand < len(Memory)
+
+
+def IsWord(Operand, Memory):
+    return MIN_INT <= Operand <= MAX_INT
+
+
+def RegisterOpCode(Mnemonic, AddressMode, Handler, Flow=FLOW_NEXT, MemoryAccess=ACCESS_NONE, ChangesAcc=False,
+                   ValidateOperand=None):
+    if len(Mnemonic.rstrip('#')) != 3 or Mnemonic.endswith('#') != (AddressMode == ADDRESS_IMMEDIATE):
+        raise ValueError("Mnemonic must be three characters, followed by # for immediate addressing: " + Mnemonic)
+    if AddressMode not in (ADDRESS_NONE, ADDRESS_IMMEDIATE, ADDRESS_DIRECT):
+        raise ValueError("Unknown addressing mode " + str(AddressMode))
+    OPCODES[Mnemonic] = OpCodeDefinition(Mnemonic, AddressMode, Handler, Flow, MemoryAccess, ChangesAcc,
+                                         ValidateOperand)
+    global OPCODE_NAMES
+    OPCODE_HANDLERS[Mnemonic] = Handler
+    OPCODE_NAMES = frozenset(OPCODES)
+    ADDRESS_OPCODES.discard(Mnemonic)
+    if AddressMode == ADDRESS_DIRECT:
+        ADDRESS_OPCODES.add(Mnemonic)
+    return OPCODES[Mnemonic]
+
+
+def HandleLDA(Memory, Registers, Operand):
+    return Memory, ExecuteLDA(Memory, Registers, Operand)
+
+
+def HandleSTA(Memory, Registers, Operand):
+    return ExecuteSTA(Memory, Registers, Operand), Registers
+
+
+def HandleLDAimm(Memory, Registers, Operand):
+    return Memory, ExecuteLDAimm(Registers, Operand)
+
+
+def HandleADD(Memory, Registers, Operand):
+    return Memory, ExecuteADD(Memory, Registers, Operand)
+
+
+def HandleSUB(Memory, Registers, Operand):
+    return Memory, ExecuteSUB(Memory, Registers, Operand)
+
+
+def HandleJMP(Memory, Registers, Operand):
+    return Memory, ExecuteJMP(Registers, Operand)
+
+
+def HandleCMPimm(Memory, Registers, Operand):
+    return Memory, ExecuteCMPimm(Registers, Operand)
+
+
+def HandleBEQ(Memory, Registers, Operand):
+    return Memory, ExecuteBEQ(Registers, Operand)
+
+
+def HandleSKP(Memory, Registers, Operand):
+    ExecuteSKP()
+    return Memory, Registers
+
+
+def HandleRTN(Memory, Registers, Operand):
+    return Memory, ExecuteRTN(Memory, Registers)
+
+
+RegisterOpCode("LDA", ADDRESS_DIRECT, HandleLDA, MemoryAccess=ACCESS_READ, ChangesAcc=True)
+RegisterOpCode("STA", ADDRESS_DIRECT, HandleSTA, MemoryAccess=ACCESS_WRITE)
+RegisterOpCode("LDA#", ADDRESS_IMMEDIATE, HandleLDAimm, ChangesAcc=True)
+RegisterOpCode("HLT", ADDRESS_NONE, None, Flow=FLOW_HALT)
+RegisterOpCode("ADD", ADDRESS_DIRECT, HandleADD, MemoryAccess=ACCESS_READ, ChangesAcc=True)
+RegisterOpCode("JMP", ADDRESS_DIRECT, HandleJMP, Flow=FLOW_JUMP)
+RegisterOpCode("SUB", ADDRESS_DIRECT, HandleSUB, MemoryAccess=ACCESS_READ, ChangesAcc=True)
+RegisterOpCode("CMP#", ADDRESS_IMMEDIATE, HandleCMPimm)
+RegisterOpCode("BEQ", ADDRESS_DIRECT, HandleBEQ, Flow=FLOW_BRANCH)
+RegisterOpCode("SKP", ADDRESS_NONE, HandleSKP)
+RegisterOpCode("JSR", ADDRESS_DIRECT, ExecuteJSR, Flow=FLOW_CALL)
+RegisterOpCode("RTN", ADDRESS_NONE, HandleRTN, Flow=FLOW_RETURN)
+RegisterOpCode("   ", ADDRESS_NONE, None)
+
+
+def ExecuteInstruction(OpCode, Operand, Memory, Registers):
+    Handler = OPCODE_HANDLERS.get(OpCode)
+    if Handler is not None:
+        Memory, Registers = Handler(Memory, Registers, Operand)
+    return Memory, Registers
+
+
+def ExecuteSteps(Memory, Registers, MaxSteps):
+    StepCount = 0
+    try:
+        OpCode = Memory[Registers[PC]].OpCode
+        while OpCode != "HLT" and Registers[ERR] == 0 and StepCount < MaxSteps:
+            Operand = Memory[Registers[PC]].OperandValue
+            Registers[PC] = Registers[PC] + 1
+            Memory, Registers = ExecuteInstruction(OpCode, Operand, Memory, Registers)
+            StepCount += 1
+            OpCode = Memory[Registers[PC]].OpCode
+    except IndexError:
+        Registers = ReportRunTimeError("Address out of range", Registers, ERROR_ADDRESS)
+    return Memory, Registers, StepCount
+
+
+def ExecuteHeadless(Memory, StepLimit=STEP_LIMIT):
+    Registers = ResetRegisters(Memory)
+    Memory, Registers, StepCount = ExecuteSteps(Memory, Registers, StepLimit)
+    if Registers[ERR] == 0 and Memory[Registers[PC]].OpCode != "HLT":
+        Registers = ReportRunTimeError("Step limit reached", Registers, ERROR_STEP_LIMIT)
+    return Memory, Registers, StepCount
+
+
+def ExecuteFrames(Memory, Registers=None, MaxSteps=STEP_LIMIT, OpCodes=None, Every=1):
+    if Registers is None:
+        Registers = ResetRegisters(Memory)
+    FrameNumber = 0
+    try:
+        while Registers[ERR] == 0 and FrameNumber < MaxSteps:
+            Address = Registers[PC]
+            OpCode = Memory[Address].OpCode
+            if OpCode == "HLT":
+                return
+            Operand = Memory[Address].OperandValue
+            Registers[PC] = Address + 1
+            Memory, Registers = ExecuteInstruction(OpCode, Operand, Memory, Registers)
+            FrameNumber += 1
+            if (OpCodes is None or OpCode in OpCodes) and FrameNumber % Every == 0:
+                ChangedAddress = None
+                ChangedValue = None
+                if OpCode == "STA":
+                    ChangedAddress = Operand
+                    ChangedValue = Memory[Operand].OperandValue
+                elif OpCode == "JSR" and Registers[ERR] == 0:
+                    ChangedAddress = Registers[TOS]
+                    ChangedValue = Memory[ChangedAddress].StackPointerValue
+                yield Frame(FrameNumber, Address, OpCode, Operand, tuple(Registers), ChangedAddress, ChangedValue)
+    except IndexError:
+        ReportRunTimeError("Address out of range", Registers, ERROR_ADDRESS)
+
+
+def Execute(SourceCode, Memory, PcMap=None, DiffOnly=False, StackObserver=DisplayStack, Viewport=None):
+    Registers = ResetRegisters(Memory)
     FrameNumber = 0
+    Cache = None
     DisplayFrameDelimiter(FrameNumber)
-    DisplayCurrentState(SourceCode, Memory, Registers)
+    if Viewport is None:
+        Cache = CreateListingCache(SourceCode, Memory, PcMap)
+        DisplayCachedState(Cache, Registers, PcMap)
+    else:
+        DisplayCurrentState(SourceCode, Memory, Registers, PcMap, Viewport)
     OpCode = Memory[Registers[PC]].OpCode
     while OpCode != "HLT":
         FrameNumber += 1
-        print()
+        Output.Print()
         DisplayFrameDelimiter(FrameNumber)
         Operand = Memory[Registers[PC]].OperandValue
-        print("*  Current Instruction Register: ", OpCode, Operand)
+        if PcMap is not None and OpCode in ADDRESS_OPCODES:
+            Output.Print("*  Current Instruction Register: ", OpCode, MapToSourceLine(PcMap, Operand))
+        else:
+            Output.Print("*  Current Instruction Register: ", OpCode, Operand)
         Registers[PC] = Registers[PC] + 1
-        if OpCode == "LDA":
-            Registers = ExecuteLDA(Memory, Registers, Operand)
-        elif OpCode == "STA":
-            Memory = ExecuteSTA(Memory, Registers, Operand)
-        elif OpCode == "LDA#":
-            Registers = ExecuteLDAimm(Registers, Operand)
-        elif OpCode == "ADD":
-            Registers = ExecuteADD(Memory, Registers, Operand)
-        elif OpCode == "JMP":
-            Registers = ExecuteJMP(Registers, Operand)
-        elif OpCode == "JSR":
-            Memory, Registers = ExecuteJSR(Memory, Registers, Operand)
-        elif OpCode == "CMP#":
-            Registers = ExecuteCMPimm(Registers, Operand)
-        elif OpCode == "BEQ":
-            Registers = ExecuteBEQ(Registers, Operand)
-        elif OpCode == "SUB":
-            Registers = ExecuteSUB(Memory, Registers, Operand)
-        elif OpCode == "SKP":
-            ExecuteSKP()
-        elif OpCode == "RTN":
-            Registers = ExecuteRTN(Memory, Registers)
+        Memory, Registers = ExecuteInstruction(OpCode, Operand, Memory, Registers)
+        if OpCode == "JSR" and Registers[ERR] == 0 and StackObserver is not None:
+            StackObserver(Memory, Registers)
+        if OpCode == "STA" and Cache is not None:
+            Cache = UpdateListingCache(Cache, SourceCode, Memory, Operand)
         if Registers[ERR] == 0:
             OpCode = Memory[Registers[PC]].OpCode
-            DisplayCurrentState(SourceCode, Memory, Registers)
+            if Cache is None:
+                DisplayCurrentState(SourceCode, Memory, Registers, PcMap, Viewport)
+            else:
+                DisplayCachedState(Cache, Registers, PcMap, DiffOnly)
         else:
             OpCode = "HLT"
-    print("Execution terminated")
+        Output.FlushAt(FLUSH_ON_FRAME)
+    Output.Print("Execution terminated")
+    Output.FlushAt(FLUSH_ON_END)
 
 
 def AssemblerSimulator():
-    SourceCode = [EMPTY_STRING for Lines in range(HI_MEM)]
-    Memory = [AssemblerInstruction() for Lines in range(HI_MEM)]
+    SourceCode = CreateSourceCode()
+    Memory = CreateMemory()
     SourceCode = ResetSourceCode(SourceCode)
     Memory = ResetMemory(Memory)
     Finished = False
@@ -415,32 +926,33 @@ def AssemblerSimulator():
             Memory = ResetMemory(Memory)
         elif MenuOption == 'D':
             if SourceCode[0] == EMPTY_STRING:
-                print("Error Code 7")
+                Output.Print("Error Code 7")
             else:
                 DisplaySourceCode(SourceCode)
         elif MenuOption == 'E':
             if SourceCode[0] == EMPTY_STRING:
-                print("Error Code 8")
+                Output.Print("Error Code 8")
             else:
                 SourceCode = EditSourceCode(SourceCode)
                 Memory = ResetMemory(Memory)
         elif MenuOption == 'A':
             if SourceCode[0] == EMPTY_STRING:
-                print("Error Code 9")
+                Output.Print("Error Code 9")
             else:
                 Memory = Assemble(SourceCode, Memory)
         elif MenuOption == 'R':
             if Memory[0].OperandValue == 0:
-                print("Error Code 10")
+                Output.Print("Error Code 10")
             elif Memory[0].OpCode == "ERR":
-                print("Error Code 11")
+                Output.Print("Error Code 11")
             else:
                 Execute(SourceCode, Memory)
         elif MenuOption == 'X':
             Finished = True
         else:
-            print("You did not choose a valid menu option. Try again")
-    print("You have chosen to exit the program")
+            Output.Print("You did not choose a valid menu option. Try again")
+    Output.Print("You have chosen to exit the program")
+    Output.FlushAt(FLUSH_ON_END)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,226 @@
+# Ahead-of-time export of a program assembled by the AQA AS 2023 skeleton program
+# writes a standalone Python module with one branch of a while loop per basic block, memory
+# as a local list and a run(initial_data) -> final_state function; modules are cached on disk
+# by a hash of the source, the assembled image and the arithmetic and stack configuration
+# the step limit is checked at basic block boundaries, so a runaway program stops within a
+# block of the limit; programs that store into their own instructions cannot be exported
+
+import hashlib
+import importlib.util
+import os
+import sys
+import time
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+import program_analysis
+
+EXPORT_DIRECTORY = "aot_programs"
+EXPORT_VERSION = 2
+CONSTANT_NAMES = ("MAX_INT", "MIN_INT", "WORD_MASK", "OVERFLOW_POLICY", "POLICY_TRAP", "POLICY_WRAP", "FLAG_Z",
+                  "FLAG_N", "FLAG_V", "FLAG_OVERFLOW", "FLAG_PARITY", "STEP_LIMIT", "ERROR_OVERFLOW",
+                  "ERROR_STACK_OVERFLOW", "ERROR_STACK_UNDERFLOW", "ERROR_STEP_LIMIT", "ERROR_ADDRESS")
+EXPORTABLE_OPCODES = ("", "   ", "LDA", "STA", "LDA#", "HLT", "ADD", "JMP", "SUB", "CMP#", "BEQ", "SKP", "JSR", "RTN")
+BLOCK_ENDS = ("HLT", "JMP", "BEQ", "JSR", "RTN")
+
+HELPERS = '''
+def flags(Value, Acc):
+    if Value > MAX_INT or Value < MIN_INT:
+        Status = FLAG_OVERFLOW
+    elif Value == 0:
+        Status = FLAG_Z
+    elif Value < 0:
+        Status = FLAG_N
+    else:
+        Status = 0
+    if FLAG_PARITY and bin(Acc & WORD_MASK).count("1") % 2 == 0:
+        Status = Status | FLAG_PARITY
+    return Status
+
+
+def arithmetic(Value):
+    if MIN_INT <= Value <= MAX_INT or OVERFLOW_POLICY == POLICY_TRAP:
+        Status = flags(Value, Value)
+        return Value, Status, Status & FLAG_V
+    if OVERFLOW_POLICY == POLICY_WRAP:
+        Acc = ((Value - MIN_INT) & WORD_MASK) + MIN_INT
+    elif Value > MAX_INT:
+        Acc = MAX_INT
+    else:
+        Acc = MIN_INT
+    return Acc, flags(Acc, Acc) | FLAG_OVERFLOW, 0
+'''
+
+
+def CreateProgramHash(SourceCode, Memory):
+    Digest = hashlib.sha256()
+    NumberOfLines = int(SourceCode[0])
+    Digest.update("\n".join(SourceCode[:NumberOfLines + 1]).encode())
+    Digest.update(repr([(Cell.OpCode, Cell.OperandValue) for Cell in Memory]).encode())
+    Digest.update(repr((EXPORT_VERSION, len(SourceCode), Skeleton.WORD_SIZE, Skeleton.STATUS_LABEL, Skeleton.STACK_SIZE,
+                        Skeleton.PROTECT_PROGRAM, [getattr(Skeleton, Name) for Name in CONSTANT_NAMES])).encode())
+    return Digest.hexdigest()[:16]
+
+
+def CheckExportable(SourceCode, Memory):
+    for Location in range(len(Memory)):
+        OpCode = Memory[Location].OpCode
+        if OpCode not in EXPORTABLE_OPCODES:
+            raise ValueError("Cannot export opcode " + OpCode)
+        if OpCode in ("LDA", "STA", "ADD", "SUB") and Memory[Location].OperandValue >= len(Memory):
+            raise ValueError("Cannot export an out of range address on line " + str(Location))
+    Analysis = program_analysis.AnalyseProgram(SourceCode, Memory)
+    if len(Analysis.SelfModifyingLines) > 0:
+        raise ValueError("Cannot export a program that stores into its own instructions")
+
+
+def FindLeaders(Memory):
+    Leaders = set([0])
+    for Location in range(len(Memory)):
+        OpCode = Memory[Location].OpCode
+        if OpCode in ("JMP", "BEQ", "JSR"):
+            Leaders.add(Memory[Location].OperandValue)
+        if OpCode in BLOCK_ENDS:
+            Leaders.add(Location + 1)
+    return sorted(Leader for Leader in Leaders if 0 <= Leader < len(Memory))
+
+
+def CreateErrorExit(NextLine, Steps, ErrorName, Message):
+    return ["    Pc, Err, Message, Steps = {}, {}, {!r}, Steps + {}".format(NextLine, ErrorName, Message, Steps),
+            "    break"]
+
+
+def CreateInstructionCode(Memory, Location, StepsSoFar):
+    OpCode = Memory[Location].OpCode
+    Operand = Memory[Location].OperandValue
+    Steps = StepsSoFar + 1
+    NextLine = Location + 1
+    if OpCode == "LDA":
+        return ["Acc = Values[{}]".format(Operand), "Status = flags(Acc, Acc)"]
+    if OpCode == "LDA#":
+        return ["Acc = {}".format(Operand), "Status = flags(Acc, Acc)"]
+    if OpCode == "STA":
+        return ["Values[{}] = Acc".format(Operand)]
+    if OpCode == "ADD" or OpCode == "SUB":
+        Sign = "+" if OpCode == "ADD" else "-"
+        return (["Acc, Status, Overflowed = arithmetic(Acc {} Values[{}])".format(Sign, Operand), "if Overflowed:"] +
+                CreateErrorExit(NextLine, Steps, "ERROR_OVERFLOW", "Overflow"))
+    if OpCode == "CMP#":
+        return ["Status = flags(Acc - {}, Acc)".format(Operand)]
+    if OpCode == "JMP":
+        return ["Pc = {}".format(Operand)]
+    if OpCode == "BEQ":
+        return ["Pc = {} if Status & FLAG_Z else {}".format(Operand, NextLine)]
+    if OpCode == "JSR":
+        return (["if Tos - 1 < STACK_LIMIT:"] +
+                CreateErrorExit(NextLine, Steps, "ERROR_STACK_OVERFLOW", "Stack overflow") +
+                ["Tos = Tos - 1",
+                 "StackValues[Tos] = {}".format(NextLine),
+                 "MaxDepth = max(MaxDepth, SIZE - Tos)",
+                 "Pc = {}".format(Operand)])
+    if OpCode == "RTN":
+        return (["if Tos >= SIZE:"] +
+                CreateErrorExit(NextLine, Steps, "ERROR_STACK_UNDERFLOW", "Stack underflow") +
+                ["Pc = StackValues[Tos]", "Tos = Tos + 1"])
+    return []
+
+
+def CreateBlockCode(Memory, Leader, End):
+    Lines = []
+    for Location in range(Leader, End):
+        if Memory[Location].OpCode == "HLT":
+            return Lines + ["Pc, Steps, Halted = {}, Steps + {}, True".format(Location, Location - Leader), "break"]
+        Lines.extend(CreateInstructionCode(Memory, Location, Location - Leader))
+    if Memory[End - 1].OpCode not in BLOCK_ENDS:
+        Lines.append("Pc = {}".format(End))
+    Lines.append("Steps += {}".format(End - Leader))
+    return Lines
+
+
+def CreateModuleSource(SourceCode, Memory):
+    Registers = Skeleton.ResetRegisters(Memory)
+    InstructionCells = [Location for Location in range(len(Memory))
+                        if program_analysis.IsInstruction(Memory, Location)]
+    Lines = ["# Generated by aot_export.py from an assembled program - do not edit", ""]
+    for Location in range(1, int(SourceCode[0]) + 1):
+        Lines.append("# {:>3d} {}".format(Location, SourceCode[Location]))
+    Lines.append("")
+    Lines.append("SIZE = {}".format(len(Memory)))
+    for Name in CONSTANT_NAMES:
+        Lines.append("{} = {!r}".format(Name, getattr(Skeleton, Name)))
+    Lines.append("STACK_LIMIT = {}".format(Registers[Skeleton.STACK_LIMIT]))
+    Lines.append("INITIAL_VALUES = {!r}".format([Cell.OperandValue for Cell in Memory]))
+    Lines.append("INSTRUCTION_CELLS = frozenset({!r})".format(InstructionCells))
+    Lines.append(HELPERS)
+    Lines.append("")
+    Lines.append("def run(initial_data=None, step_limit=STEP_LIMIT):")
+    Lines.append("    Values = list(INITIAL_VALUES)")
+    Lines.append("    if initial_data is not None:")
+    Lines.append("        for Address in initial_data:")
+    Lines.append("            if int(Address) in INSTRUCTION_CELLS:")
+    Lines.append("                raise ValueError(\"initial_data cannot change instruction \" + str(Address))")
+    Lines.append("            Values[int(Address)] = initial_data[Address]")
+    Lines.append("    StackValues = [0] * SIZE")
+    Lines.append("    Pc, Acc, Status, Tos, Err, MaxDepth = 0, 0, flags(0, 0), SIZE, 0, 0")
+    Lines.append("    Steps = 0")
+    Lines.append("    Message = None")
+    Lines.append("    Halted = False")
+    Lines.append("    while Steps < step_limit:")
+    Leaders = FindLeaders(Memory)
+    for Index in range(len(Leaders)):
+        Leader = Leaders[Index]
+        End = len(Memory)
+        if Index + 1 < len(Leaders):
+            End = Leaders[Index + 1]
+        for Location in range(Leader, End):
+            if Memory[Location].OpCode in BLOCK_ENDS:
+                End = Location + 1
+                break
+        Keyword = "if" if Index == 0 else "elif"
+        Lines.append("        {} Pc == {}:".format(Keyword, Leader))
+        for Line in CreateBlockCode(Memory, Leader, End):
+            Lines.append("            " + Line)
+    Lines.append("        else:")
+    Lines.append("            Err, Message = ERROR_ADDRESS, \"Address out of range\"")
+    Lines.append("            break")
+    Lines.append("    if Err == 0 and not Halted:")
+    Lines.append("        Err, Message = ERROR_STEP_LIMIT, \"Step limit reached\"")
+    Lines.append("    return {\"registers\": [Pc, Acc, Status, Tos, Err, STACK_LIMIT, MaxDepth], \"memory\": Values,")
+    Lines.append("            \"stack\": StackValues[Tos:], \"steps\": Steps, \"message\": Message}")
+    return "\n".join(Lines) + "\n"
+
+
+def ExportProgram(SourceCode, Memory, Directory=EXPORT_DIRECTORY):
+    FileName = os.path.join(Directory, "program_" + CreateProgramHash(SourceCode, Memory) + ".py")
+    if not os.path.exists(FileName):
+        CheckExportable(SourceCode, Memory)
+        os.makedirs(Directory, exist_ok=True)
+        TemporaryName = FileName + "." + str(os.getpid())
+        FileOut = open(TemporaryName, 'w')
+        FileOut.write(CreateModuleSource(SourceCode, Memory))
+        FileOut.close()
+        os.replace(TemporaryName, FileName)
+    return FileName
+
+
+def LoadProgram(SourceCode, Memory, Directory=EXPORT_DIRECTORY):
+    FileName = ExportProgram(SourceCode, Memory, Directory)
+    ModuleName = os.path.splitext(os.path.basename(FileName))[0]
+    Specification = importlib.util.spec_from_file_location(ModuleName, FileName)
+    Module = importlib.util.module_from_spec(Specification)
+    Specification.loader.exec_module(Module)
+    return Module
+
+
+if __name__ == "__main__":
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(sys.argv[1])
+    if Memory[0].OpCode != "ERR":
+        Directory = EXPORT_DIRECTORY
+        if len(sys.argv) > 2:
+            Directory = sys.argv[2]
+        Program = LoadProgram(SourceCode, Memory, Directory)
+        Skeleton.Output.Print("Exported to", Program.__file__)
+        StartTime = time.perf_counter()
+        for Run in range(1000):
+            FinalState = Program.run()
+        Skeleton.Output.Print("1000 runs in {:.4f}s".format(time.perf_counter() - StartTime))
+        Skeleton.Output.Print(FinalState)
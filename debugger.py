@@ -0,0 +1,291 @@
+# Breakpoints and watchpoints for the AQA AS 2023 skeleton program
+# address and label breakpoints (optionally conditional on ACC/STATUS) and memory watchpoints
+# on STA and JSR stack writes; with nothing set a run is just the headless ExecuteSteps loop
+# step over, step out and run to line use the call depth (return addresses on the stack),
+# checked only after RTN instructions, so a stepped-over subroutine runs without frames
+# on a peephole optimised program, pass its LineMap and PcMap so that breakpoints, watchpoints
+# and stop events use the original source line numbers
+
+import operator
+import sys
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+
+STOP_HALT = "halt"
+STOP_ERROR = "error"
+STOP_LIMIT = "limit"
+STOP_BREAKPOINT = "breakpoint"
+STOP_WATCHPOINT = "watchpoint"
+STOP_STEP = "step"
+STOP_RETURN = "return"
+STOP_LINE = "line"
+
+COMPARISONS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt, ">": operator.gt,
+               "<=": operator.le, ">=": operator.ge}
+CONDITION_REGISTERS = {"ACC": Skeleton.ACC, "STATUS": Skeleton.STATUS, "TOS": Skeleton.TOS}
+DEBUG_PROMPT = "s step, n step over, o step out, u <line> run to line, b <line> break, c continue, q quit: "
+
+
+class StopEvent:
+    def __init__(self, Reason, Address=None, OldValue=None, NewValue=None):
+        self.Reason = Reason
+        self.Address = Address
+        self.OldValue = OldValue
+        self.NewValue = NewValue
+
+
+def ParseCondition(ConditionText):
+    Parts = ConditionText.split()
+    if len(Parts) != 3 or Parts[0].upper() not in CONDITION_REGISTERS or Parts[1] not in COMPARISONS:
+        return None
+    try:
+        return CONDITION_REGISTERS[Parts[0].upper()], COMPARISONS[Parts[1]], int(Parts[2])
+    except ValueError:
+        return None
+
+
+def ConditionHolds(Condition, Registers):
+    if Condition is None:
+        return True
+    Register, Comparison, Value = Condition
+    return Comparison(Registers[Register], Value)
+
+
+class Debugger:
+    def __init__(self, Memory, SymbolTable=None, LineMap=None, PcMap=None):
+        if SymbolTable is None:
+            SymbolTable = {}
+        if (LineMap is None) != (PcMap is None):
+            raise ValueError("LineMap and PcMap must be given together")
+        self.Memory = Memory
+        self.SymbolTable = SymbolTable
+        self.LineMap = LineMap
+        self.PcMap = PcMap
+        self.Breakpoints = {}
+        self.Watchpoints = set()
+        self.CheckAddresses = set()
+
+    def MapLine(self, Line):
+        if self.LineMap is not None and Line in self.LineMap:
+            return self.LineMap[Line]
+        return Line
+
+    def MapAddress(self, Address):
+        return Skeleton.MapToSourceLine(self.PcMap, Address)
+
+    def AddBreakpoint(self, Line, ConditionText=None):
+        Condition = None
+        if ConditionText is not None:
+            Condition = ParseCondition(ConditionText)
+            if Condition is None:
+                return False
+        Address = self.MapLine(Line)
+        if Address not in self.Breakpoints:
+            self.Breakpoints[Address] = []
+        self.Breakpoints[Address].append(Condition)
+        self.CompileChecks()
+        return True
+
+    def AddLabelBreakpoint(self, Label, ConditionText=None):
+        if Label not in self.SymbolTable:
+            return False
+        return self.AddBreakpoint(self.SymbolTable[Label], ConditionText)
+
+    def RemoveBreakpoint(self, Line):
+        Address = self.MapLine(Line)
+        if Address in self.Breakpoints:
+            del self.Breakpoints[Address]
+        self.CompileChecks()
+
+    def AddWatchpoint(self, Address):
+        Address = self.ResolveAddress(Address)
+        if not 0 <= self.MapLine(Address) < len(self.Memory):
+            raise ValueError("Watchpoint address out of range: " + str(Address))
+        self.Watchpoints.add(self.MapLine(Address))
+        self.CompileChecks()
+        return Address
+
+    def RemoveWatchpoint(self, Address):
+        self.Watchpoints.discard(self.MapLine(self.ResolveAddress(Address)))
+        self.CompileChecks()
+
+    def CompileChecks(self):
+        self.CheckAddresses = set(self.Breakpoints)
+        if len(self.Watchpoints) > 0:
+            StoreLines = []
+            SelfModifying = False
+            for Location in range(len(self.Memory)):
+                OpCode = self.Memory[Location].OpCode
+                if OpCode == "JSR":
+                    self.CheckAddresses.add(Location)
+                elif OpCode == "STA":
+                    StoreLines.append(Location)
+                    Target = self.Memory[Location].OperandValue
+                    if 0 <= Target < len(self.Memory) and self.Memory[Target].OpCode in ("STA", "JSR"):
+                        SelfModifying = True
+            for Location in StoreLines:
+                if SelfModifying or self.Memory[Location].OperandValue in self.Watchpoints:
+                    self.CheckAddresses.add(Location)
+
+    def WrittenAddress(self, OpCode, Registers):
+        if OpCode == "STA":
+            return self.Memory[Registers[Skeleton.PC]].OperandValue
+        if OpCode == "JSR":
+            return Registers[Skeleton.TOS] - 1
+        return None
+
+    def BreakpointHit(self, Address, Registers):
+        if Address in self.Breakpoints:
+            for Condition in self.Breakpoints[Address]:
+                if ConditionHolds(Condition, Registers):
+                    return True
+        return False
+
+    def ResolveAddress(self, Address):
+        if Address in self.SymbolTable:
+            return self.SymbolTable[Address]
+        return int(Address)
+
+    def Run(self, Registers, MaxSteps=Skeleton.STEP_LIMIT, Resuming=False, ReturnDepth=None):
+        Memory = self.Memory
+        CheckAddresses = self.CheckAddresses
+        if ReturnDepth is not None:
+            CheckAddresses = CheckAddresses | set(Location for Location in range(len(Memory))
+                                                  if Memory[Location].OpCode == "RTN")
+        if len(CheckAddresses) == 0:
+            Memory, Registers, StepCount = Skeleton.ExecuteSteps(Memory, Registers, MaxSteps)
+            return Registers, StepCount, self.FinalStop(Registers)
+        StepCount = 0
+        try:
+            while StepCount < MaxSteps and Registers[Skeleton.ERR] == 0:
+                Address = Registers[Skeleton.PC]
+                OpCode = Memory[Address].OpCode
+                if OpCode == "HLT":
+                    break
+                Watched = None
+                if Address in CheckAddresses:
+                    if not (Resuming and StepCount == 0) and self.BreakpointHit(Address, Registers):
+                        return Registers, StepCount, StopEvent(STOP_BREAKPOINT, self.MapAddress(Address))
+                    Watched = self.WrittenAddress(OpCode, Registers)
+                    if Watched not in self.Watchpoints:
+                        Watched = None
+                    elif OpCode == "STA":
+                        OldValue = Memory[Watched].OperandValue
+                    else:
+                        OldValue = Memory[Watched].StackPointerValue
+                Registers[Skeleton.PC] = Address + 1
+                Memory, Registers = Skeleton.ExecuteInstruction(OpCode, Memory[Address].OperandValue, Memory, Registers)
+                StepCount += 1
+                if Watched is not None and Registers[Skeleton.ERR] == 0:
+                    if OpCode == "STA":
+                        NewValue = Memory[Watched].OperandValue
+                    else:
+                        NewValue = Memory[Watched].StackPointerValue
+                    return Registers, StepCount, StopEvent(STOP_WATCHPOINT, self.MapAddress(Watched), OldValue,
+                                                           NewValue)
+                if ReturnDepth is not None and OpCode == "RTN" and Registers[Skeleton.ERR] == 0:
+                    if Skeleton.GetStackDepth(Memory, Registers) <= ReturnDepth:
+                        return Registers, StepCount, StopEvent(STOP_RETURN, self.MapAddress(Registers[Skeleton.PC]))
+        except IndexError:
+            Registers = Skeleton.ReportRunTimeError("Address out of range", Registers, Skeleton.ERROR_ADDRESS)
+        return Registers, StepCount, self.FinalStop(Registers)
+
+    def Step(self, Registers):
+        Registers, StepCount, Event = self.Run(Registers, 1, True)
+        if Event.Reason == STOP_LIMIT:
+            Event.Reason = STOP_STEP
+        return Registers, StepCount, Event
+
+    def StepOver(self, Registers, MaxSteps=Skeleton.STEP_LIMIT):
+        Depth = Skeleton.GetStackDepth(self.Memory, Registers)
+        Registers, StepCount, Event = self.Step(Registers)
+        if Event.Reason == STOP_STEP and Skeleton.GetStackDepth(self.Memory, Registers) > Depth:
+            Registers, Steps, Event = self.Run(Registers, MaxSteps - StepCount, False, Depth)
+            StepCount += Steps
+        return Registers, StepCount, Event
+
+    def StepOut(self, Registers, MaxSteps=Skeleton.STEP_LIMIT):
+        Depth = Skeleton.GetStackDepth(self.Memory, Registers)
+        if Depth == 0:
+            return self.Run(Registers, MaxSteps, True)
+        return self.Run(Registers, MaxSteps, True, Depth - 1)
+
+    def RunToLine(self, Registers, Line, MaxSteps=Skeleton.STEP_LIMIT):
+        Line = self.ResolveAddress(Line)
+        Address = self.MapLine(Line)
+        Existing = list(self.Breakpoints.get(Address, []))
+        self.AddBreakpoint(Line)
+        try:
+            Registers, StepCount, Event = self.Run(Registers, MaxSteps, True)
+        finally:
+            self.RemoveBreakpoint(Line)
+            if len(Existing) > 0:
+                self.Breakpoints[Address] = Existing
+                self.CompileChecks()
+        if Event.Reason == STOP_BREAKPOINT and Registers[Skeleton.PC] == Address:
+            Event.Reason = STOP_LINE
+        return Registers, StepCount, Event
+
+    def FinalStop(self, Registers):
+        Line = self.MapAddress(Registers[Skeleton.PC])
+        if Registers[Skeleton.ERR] != 0:
+            return StopEvent(STOP_ERROR, Line)
+        if self.Memory[Registers[Skeleton.PC]].OpCode == "HLT":
+            return StopEvent(STOP_HALT, Line)
+        return StopEvent(STOP_LIMIT, Line)
+
+
+def DisplayStopEvent(Event):
+    if Event.Reason == STOP_WATCHPOINT:
+        Skeleton.Output.Print("Watchpoint: location", Event.Address, "changed from", Event.OldValue, "to", Event.NewValue)
+    elif Event.Reason == STOP_BREAKPOINT:
+        Skeleton.Output.Print("Breakpoint at line", Event.Address)
+    elif Event.Reason == STOP_LIMIT:
+        Skeleton.Output.Print("Stopped at line", Event.Address, "after the step limit")
+    elif Event.Reason == STOP_HALT:
+        Skeleton.Output.Print("Program halted at line", Event.Address)
+    elif Event.Reason == STOP_RETURN:
+        Skeleton.Output.Print("Returned to line", Event.Address)
+    elif Event.Reason == STOP_LINE:
+        Skeleton.Output.Print("Reached line", Event.Address)
+
+
+def DebugSession(SourceCode, Memory, SymbolTable, LineMap=None, PcMap=None):
+    Session = Debugger(Memory, SymbolTable, LineMap, PcMap)
+    Registers = Skeleton.ResetRegisters(Memory)
+    Skeleton.DisplayCurrentState(SourceCode, Memory, Registers, PcMap)
+    Event = None
+    while Event is None or Event.Reason not in (STOP_HALT, STOP_ERROR, STOP_LIMIT):
+        Command = Skeleton.GetInput(DEBUG_PROMPT).split()
+        if len(Command) == 0:
+            continue
+        try:
+            if Command[0] == 's':
+                Registers, StepCount, Event = Session.Step(Registers)
+            elif Command[0] == 'n':
+                Registers, StepCount, Event = Session.StepOver(Registers)
+            elif Command[0] == 'o':
+                Registers, StepCount, Event = Session.StepOut(Registers)
+            elif Command[0] == 'u' and len(Command) == 2:
+                Registers, StepCount, Event = Session.RunToLine(Registers, Command[1])
+            elif Command[0] == 'b' and len(Command) == 2:
+                Session.AddBreakpoint(Session.ResolveAddress(Command[1]))
+                continue
+            elif Command[0] == 'c':
+                Registers, StepCount, Event = Session.Run(Registers, Skeleton.STEP_LIMIT, True)
+            elif Command[0] == 'q':
+                break
+            else:
+                continue
+        except ValueError:
+            Skeleton.Output.Print("Unknown line or label")
+            continue
+        Skeleton.Output.Print("Steps:", StepCount, " Call depth:", Skeleton.GetStackDepth(Memory, Registers))
+        Skeleton.DisplayCurrentState(SourceCode, Memory, Registers, PcMap)
+        DisplayStopEvent(Event)
+
+
+if __name__ == "__main__":
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(sys.argv[1])
+    if Memory[0].OpCode != "ERR":
+        DebugSession(SourceCode, Memory, SymbolTable)
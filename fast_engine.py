@@ -0,0 +1,203 @@
+# Fast headless engine for programs assembled by the AQA AS 2023 skeleton program
+# a post-assembly pass fuses CMP# + BEQ pairs and LDA + ADD/SUB + STA triples into single
+# dispatches and runs CMP#/BEQ/ADD/JMP counted loops in closed form; frame-by-frame display
+# still uses Execute(), which runs one instruction per frame
+# operands are copied into the plan once, so a program whose STAs can write an instruction
+# cell gets no fused entries
+
+import sys
+import time
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+import program_analysis
+from output_sink import NullSink
+
+PC = Skeleton.PC
+ACC = Skeleton.ACC
+STATUS = Skeleton.STATUS
+ERR = Skeleton.ERR
+
+
+def FindWrittenCells(Memory):
+    return program_analysis.FindMemoryAccesses(
+        Memory, range(len(Memory)), program_analysis.GetMemoryOpCodes(Skeleton.ACCESS_WRITE))
+
+
+def IsSelfModifying(Memory, Written):
+    return any(0 <= Location < len(Memory) and program_analysis.IsInstruction(Memory, Location)
+               for Location in Written)
+
+
+def IsInMemory(Memory, *Addresses):
+    return all(0 <= Address < len(Memory) for Address in Addresses)
+
+
+def ExecuteCMPimmBEQ(Memory, Registers, Operands, StepsLeft):
+    Value, Target, NextLine = Operands
+    Registers = Skeleton.SetFlags(Registers[ACC] - Value, Registers)
+    if Registers[STATUS] & Skeleton.FLAG_Z:
+        Registers[PC] = Target
+    else:
+        Registers[PC] = NextLine
+    return Memory, Registers, 2
+
+
+def ExecuteLoadArithmeticStore(Memory, Registers, Operands, StepsLeft):
+    Source, Arithmetic, Operand, Destination, Location = Operands
+    Registers[PC] = Location + 1
+    Registers[ACC] = Memory[Source].OperandValue
+    Registers = Skeleton.SetFlags(Registers[ACC], Registers)
+    Registers[PC] = Location + 2
+    Registers = Arithmetic(Memory, Registers, Operand)
+    if Registers[ERR] != 0:
+        return Memory, Registers, 2
+    Registers[PC] = Location + 3
+    Memory[Destination].OperandValue = Registers[ACC]
+    return Memory, Registers, 3
+
+
+def CountSafeSteps(Acc, Step):
+    if Step > 0:
+        return (Skeleton.MAX_INT - Acc) // Step
+    if Step < 0:
+        return (Acc - Skeleton.MIN_INT) // -Step
+    return None
+
+
+def CountIterationsToExit(Acc, Step, Limit):
+    if Step == 0 or (Limit - Acc) % Step != 0 or (Limit - Acc) // Step < 0:
+        return None
+    return (Limit - Acc) // Step
+
+
+def ExecuteCountedLoop(Memory, Registers, Operands, StepsLeft):
+    Limit, Exit, Arithmetic, Increment, Location = Operands
+    Iterations = StepsLeft // 4
+    if Skeleton.OVERFLOW_POLICY == Skeleton.POLICY_TRAP and Skeleton.MIN_INT <= Registers[ACC] <= Skeleton.MAX_INT:
+        Step = Memory[Increment].OperandValue
+        if Arithmetic == "SUB":
+            Step = -Step
+        for Bound in (CountIterationsToExit(Registers[ACC], Step, Limit), CountSafeSteps(Registers[ACC], Step)):
+            if Bound is not None and Bound < Iterations:
+                Iterations = Bound
+        if Iterations > 0:
+            Registers[ACC] = Registers[ACC] + Iterations * Step
+            Registers = Skeleton.SetFlags(Registers[ACC], Registers)
+            Registers[PC] = Location
+            return Memory, Registers, 4 * Iterations
+    return ExecuteCMPimmBEQ(Memory, Registers, (Limit, Exit, Location + 2), StepsLeft)
+
+
+def FindCountedLoop(Memory, Location, Targets, Written):
+    if Location + 3 >= len(Memory):
+        return None
+    Compare, Branch, Arithmetic, Jump = Memory[Location:Location + 4]
+    if Compare.OpCode != "CMP#" or Branch.OpCode != "BEQ" or Arithmetic.OpCode not in ("ADD", "SUB"):
+        return None
+    if Jump.OpCode != "JMP" or Jump.OperandValue != Location:
+        return None
+    if not IsInMemory(Memory, Arithmetic.OperandValue) or Arithmetic.OperandValue in Written:
+        return None
+    for Line in range(Location + 1, Location + 4):
+        if Line in Targets:
+            return None
+    return (ExecuteCountedLoop, 2,
+            (Compare.OperandValue, Branch.OperandValue, Arithmetic.OpCode, Arithmetic.OperandValue, Location))
+
+
+def CreateFusionPlan(Memory):
+    Plan = [None for Location in range(len(Memory))]
+    Targets = program_analysis.FindBranchTargets(Memory, range(len(Memory)))
+    Written = FindWrittenCells(Memory)
+    if IsSelfModifying(Memory, Written):
+        return Plan
+    for Location in range(len(Memory) - 1):
+        First = Memory[Location]
+        Second = Memory[Location + 1]
+        Loop = FindCountedLoop(Memory, Location, Targets, Written)
+        if Loop is not None:
+            Plan[Location] = Loop
+        elif First.OpCode == "CMP#" and Second.OpCode == "BEQ":
+            if Location + 1 not in Targets:
+                Plan[Location] = (ExecuteCMPimmBEQ, 2, (First.OperandValue, Second.OperandValue, Location + 2))
+        elif First.OpCode == "LDA" and Location + 2 < len(Memory) and Memory[Location + 2].OpCode == "STA":
+            if Second.OpCode == "ADD":
+                Arithmetic = Skeleton.ExecuteADD
+            elif Second.OpCode == "SUB":
+                Arithmetic = Skeleton.ExecuteSUB
+            else:
+                continue
+            if Location + 1 in Targets or Location + 2 in Targets:
+                continue
+            if not IsInMemory(Memory, First.OperandValue, Second.OperandValue, Memory[Location + 2].OperandValue):
+                continue
+            Plan[Location] = (ExecuteLoadArithmeticStore, 3,
+                              (First.OperandValue, Arithmetic, Second.OperandValue, Memory[Location + 2].OperandValue,
+                               Location))
+    return Plan
+
+
+def ExecuteFused(Memory, Registers, MaxSteps, Plan=None):
+    if Plan is None:
+        Plan = CreateFusionPlan(Memory)
+    Handlers = Skeleton.OPCODE_HANDLERS
+    StepCount = 0
+    try:
+        while Registers[ERR] == 0 and StepCount < MaxSteps:
+            Address = Registers[PC]
+            Fused = Plan[Address]
+            if Fused is not None and StepCount + Fused[1] <= MaxSteps:
+                Memory, Registers, Steps = Fused[0](Memory, Registers, Fused[2], MaxSteps - StepCount)
+                StepCount += Steps
+                continue
+            Cell = Memory[Address]
+            OpCode = Cell.OpCode
+            if OpCode == "HLT":
+                break
+            Registers[PC] = Address + 1
+            Handler = Handlers.get(OpCode)
+            if Handler is not None:
+                Memory, Registers = Handler(Memory, Registers, Cell.OperandValue)
+            StepCount += 1
+    except IndexError:
+        Registers = Skeleton.ReportRunTimeError("Address out of range", Registers, Skeleton.ERROR_ADDRESS)
+    return Memory, Registers, StepCount
+
+
+def ExecuteHeadlessFast(Memory, StepLimit=Skeleton.STEP_LIMIT, Plan=None):
+    Registers = Skeleton.ResetRegisters(Memory)
+    Memory, Registers, StepCount = ExecuteFused(Memory, Registers, StepLimit, Plan)
+    if Registers[ERR] == 0 and Memory[Registers[PC]].OpCode != "HLT":
+        Registers = Skeleton.ReportRunTimeError("Step limit reached", Registers, Skeleton.ERROR_STEP_LIMIT)
+    return Memory, Registers, StepCount
+
+
+def CompareEngines(Memory, Runs):
+    PreviousSink = Skeleton.SetOutputSink(NullSink())
+    Plan = CreateFusionPlan(Memory)
+    Results = []
+    for Engine in (Skeleton.ExecuteHeadless, ExecuteHeadlessFast):
+        StartTime = time.perf_counter()
+        for Run in range(Runs):
+            if Engine is ExecuteHeadlessFast:
+                Final, Registers, StepCount = Engine(Skeleton.CopyMemory(Memory), Skeleton.STEP_LIMIT, Plan)
+            else:
+                Final, Registers, StepCount = Engine(Skeleton.CopyMemory(Memory))
+        Results.append((time.perf_counter() - StartTime, Registers, StepCount,
+                        [Cell.OperandValue for Cell in Final]))
+    Skeleton.SetOutputSink(PreviousSink)
+    return Results
+
+
+if __name__ == "__main__":
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(sys.argv[1])
+    if Memory[0].OpCode != "ERR":
+        Runs = 10000
+        if len(sys.argv) > 2:
+            Runs = int(sys.argv[2])
+        Fused = [Location for Location, Entry in enumerate(CreateFusionPlan(Memory)) if Entry is not None]
+        Skeleton.Output.Print("Fused sequences start at lines:", Fused)
+        Original, Fast = CompareEngines(Memory, Runs)
+        Skeleton.Output.Print("ExecuteHeadless:     {:.3f}s".format(Original[0]))
+        Skeleton.Output.Print("ExecuteHeadlessFast: {:.3f}s".format(Fast[0]))
+        Skeleton.Output.Print("Results match:", Original[1:] == Fast[1:])
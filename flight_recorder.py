@@ -0,0 +1,109 @@
+# Flight recorder for headless runs of the AQA AS 2023 skeleton program
+# keeps the last few frames (instruction, registers and the cell a STA overwrote) in lists
+# allocated once; when a run stops with a run-time error or at the step limit the recorded
+# frames are replayed in the DisplayCurrentState format
+
+import sys
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+
+FLIGHT_RECORDER_SIZE = 8
+NO_WRITE = -1
+
+
+class FlightRecorder:
+    def __init__(self, Capacity=FLIGHT_RECORDER_SIZE):
+        self.Capacity = Capacity
+        self.FrameNumbers = [0] * Capacity
+        self.OpCodes = [Skeleton.EMPTY_STRING] * Capacity
+        self.Operands = [0] * Capacity
+        self.Registers = [0] * (Capacity * Skeleton.NUMBER_OF_REGISTERS)
+        self.WrittenAddresses = [NO_WRITE] * Capacity
+        self.OldValues = [0] * Capacity
+        self.Count = 0
+
+    def Clear(self):
+        self.Count = 0
+
+    def GetSlots(self):
+        First = max(0, self.Count - self.Capacity)
+        return [FrameIndex % self.Capacity for FrameIndex in range(First, self.Count)]
+
+    def GetRegisters(self, Slot):
+        Base = Slot * Skeleton.NUMBER_OF_REGISTERS
+        return self.Registers[Base:Base + Skeleton.NUMBER_OF_REGISTERS]
+
+    def Dump(self, SourceCode, Memory):
+        Slots = self.GetSlots()
+        FrameMemory = Skeleton.CopyMemory(Memory)
+        for Slot in reversed(Slots):
+            if self.WrittenAddresses[Slot] != NO_WRITE:
+                FrameMemory[self.WrittenAddresses[Slot]].OperandValue = self.OldValues[Slot]
+        Skeleton.Output.Print()
+        Skeleton.Output.Print("Flight recorder: last", len(Slots), "frames")
+        for Slot in Slots:
+            Registers = self.GetRegisters(Slot)
+            if self.WrittenAddresses[Slot] != NO_WRITE:
+                FrameMemory[self.WrittenAddresses[Slot]].OperandValue = Registers[Skeleton.ACC]
+            Skeleton.Output.Print()
+            Skeleton.DisplayFrameDelimiter(self.FrameNumbers[Slot])
+            Skeleton.Output.Print("*  Current Instruction Register: ", self.OpCodes[Slot], self.Operands[Slot])
+            Skeleton.DisplayCurrentState(SourceCode, FrameMemory, Registers)
+
+
+def ExecuteRecorded(Memory, Registers, MaxSteps, Recorder):
+    Capacity = Recorder.Capacity
+    RegisterCount = Skeleton.NUMBER_OF_REGISTERS
+    FrameNumbers = Recorder.FrameNumbers
+    OpCodes = Recorder.OpCodes
+    Operands = Recorder.Operands
+    RecordedRegisters = Recorder.Registers
+    WrittenAddresses = Recorder.WrittenAddresses
+    OldValues = Recorder.OldValues
+    StepCount = 0
+    try:
+        OpCode = Memory[Registers[Skeleton.PC]].OpCode
+        while OpCode != "HLT" and Registers[Skeleton.ERR] == 0 and StepCount < MaxSteps:
+            Operand = Memory[Registers[Skeleton.PC]].OperandValue
+            Slot = Recorder.Count % Capacity
+            if OpCode == "STA":
+                WrittenAddresses[Slot] = Operand
+                OldValues[Slot] = Memory[Operand].OperandValue
+            else:
+                WrittenAddresses[Slot] = NO_WRITE
+            Registers[Skeleton.PC] = Registers[Skeleton.PC] + 1
+            Memory, Registers = Skeleton.ExecuteInstruction(OpCode, Operand, Memory, Registers)
+            StepCount += 1
+            Recorder.Count += 1
+            FrameNumbers[Slot] = Recorder.Count
+            OpCodes[Slot] = OpCode
+            Operands[Slot] = Operand
+            RecordedRegisters[Slot * RegisterCount:(Slot + 1) * RegisterCount] = Registers
+            OpCode = Memory[Registers[Skeleton.PC]].OpCode
+    except IndexError:
+        Registers = Skeleton.ReportRunTimeError("Address out of range", Registers, Skeleton.ERROR_ADDRESS)
+    return Memory, Registers, StepCount
+
+
+def ExecuteHeadlessRecorded(SourceCode, Memory, StepLimit=Skeleton.STEP_LIMIT, Recorder=None):
+    if Recorder is None:
+        Recorder = FlightRecorder()
+    Recorder.Clear()
+    Registers = Skeleton.ResetRegisters(Memory)
+    Memory, Registers, StepCount = ExecuteRecorded(Memory, Registers, StepLimit, Recorder)
+    if Registers[Skeleton.ERR] == 0 and Memory[Registers[Skeleton.PC]].OpCode != "HLT":
+        Registers = Skeleton.ReportRunTimeError("Step limit reached", Registers, Skeleton.ERROR_STEP_LIMIT)
+    if Registers[Skeleton.ERR] != 0:
+        Recorder.Dump(SourceCode, Memory)
+    return Memory, Registers, StepCount
+
+
+if __name__ == "__main__":
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(sys.argv[1])
+    if Memory[0].OpCode != "ERR":
+        Capacity = FLIGHT_RECORDER_SIZE
+        if len(sys.argv) > 2:
+            Capacity = int(sys.argv[2])
+        Memory, Registers, StepCount = ExecuteHeadlessRecorded(SourceCode, Memory, Skeleton.STEP_LIMIT,
+                                                               FlightRecorder(Capacity))
+        Skeleton.Output.Print("Steps:", StepCount, " Error:", Registers[Skeleton.ERR])
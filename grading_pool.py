@@ -0,0 +1,133 @@
+# Process pool for grading many runs of assembled programs
+# assembled program images are packed into shared memory once as opcode/operand arrays;
+# warm workers attach to them by name and run each job on their own writable copy
+# opcodes are numbered from the registry when the pool starts, so plugin opcodes must be
+# registered before the GradingPool is created; workers started with spawn import a fresh
+# skeleton, so pass the plugin's install function as Installer to register them there too
+
+import sys
+import time
+from multiprocessing import Pool, resource_tracker, shared_memory
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+from output_sink import NullSink
+from result_cache import ResultCache
+
+HEADER_SIZE = 1
+WORD_SIZE = 8
+
+WorkerImages = {}
+WorkerOpCodeTable = []
+WorkerCache = None
+
+
+def CreateOpCodeTable():
+    return [Skeleton.EMPTY_STRING] + list(Skeleton.OPCODES)
+
+
+def PackProgram(Memory, OpCodeTable):
+    OpCodes = {}
+    for Code in range(len(OpCodeTable)):
+        OpCodes[OpCodeTable[Code]] = Code
+    Image = [len(Memory)]
+    for Cell in Memory:
+        if Cell.OpCode not in OpCodes:
+            raise ValueError("Cannot pack opcode " + Cell.OpCode)
+        Image.append(OpCodes[Cell.OpCode])
+        Image.append(Cell.OperandValue)
+    return Image
+
+
+def UnpackProgram(Words, OpCodeTable):
+    Size = Words[0]
+    Memory = Skeleton.CreateMemory(Size)
+    for Location in range(Size):
+        Memory[Location].OpCode = OpCodeTable[Words[HEADER_SIZE + 2 * Location]]
+        Memory[Location].OperandValue = Words[HEADER_SIZE + 2 * Location + 1]
+    return Memory
+
+
+def PublishProgram(Memory, OpCodeTable):
+    Image = PackProgram(Memory, OpCodeTable)
+    Segment = shared_memory.SharedMemory(create=True, size=len(Image) * WORD_SIZE)
+    Words = Segment.buf.cast('q')
+    for Index in range(len(Image)):
+        Words[Index] = Image[Index]
+    Words.release()
+    return Segment
+
+
+def CheckOpCodeTable(OpCodeTable):
+    for Mnemonic in OpCodeTable[1:]:
+        if Mnemonic not in Skeleton.OPCODES:
+            raise ValueError("Opcode " + Mnemonic + " is not registered in the worker, pass its Installer")
+
+
+def InitialiseWorker(OpCodeTable, CacheDirectory=None, Installer=None):
+    global WorkerOpCodeTable, WorkerCache
+    if Installer is not None:
+        Installer()
+    WorkerOpCodeTable = OpCodeTable
+    WorkerCache = ResultCache(Directory=CacheDirectory)
+    Skeleton.SetOutputSink(NullSink())
+
+
+def AttachProgram(ImageName):
+    if ImageName not in WorkerImages:
+        CheckOpCodeTable(WorkerOpCodeTable)
+        Segment = shared_memory.SharedMemory(name=ImageName)
+        resource_tracker.unregister(Segment._name, "shared_memory")
+        Words = Segment.buf.cast('q')
+        WorkerImages[ImageName] = UnpackProgram(Words, WorkerOpCodeTable)
+        Words.release()
+        Segment.close()
+    return WorkerImages[ImageName]
+
+
+def RunJob(Job):
+    ImageName, InitialData, StepLimit = Job
+    Memory = Skeleton.CopyMemory(AttachProgram(ImageName))
+    for Address in InitialData:
+        Memory[Address].OperandValue = InitialData[Address]
+    Memory, Registers, StepCount = WorkerCache.Run(Memory, StepLimit)
+    return Registers, [Cell.OperandValue for Cell in Memory], StepCount
+
+
+class GradingPool:
+    def __init__(self, Processes=None, CacheDirectory=None, Installer=None):
+        self.OpCodeTable = CreateOpCodeTable()
+        self.Pool = Pool(Processes, initializer=InitialiseWorker,
+                         initargs=(self.OpCodeTable, CacheDirectory, Installer))
+        self.Segments = {}
+
+    def AddProgram(self, Memory):
+        Segment = PublishProgram(Memory, self.OpCodeTable)
+        self.Segments[Segment.name] = Segment
+        return Segment.name
+
+    def Run(self, ImageName, InitialDataList, StepLimit=Skeleton.STEP_LIMIT, ChunkSize=64):
+        Jobs = [(ImageName, InitialData, StepLimit) for InitialData in InitialDataList]
+        return self.Pool.map(RunJob, Jobs, ChunkSize)
+
+    def Close(self):
+        self.Pool.close()
+        self.Pool.join()
+        for Segment in self.Segments.values():
+            Segment.close()
+            Segment.unlink()
+        self.Segments = {}
+
+
+if __name__ == "__main__":
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(sys.argv[1])
+    if Memory[0].OpCode != "ERR":
+        NumberOfJobs = 1000
+        if len(sys.argv) > 2:
+            NumberOfJobs = int(sys.argv[2])
+        Graders = GradingPool()
+        ImageName = Graders.AddProgram(Memory)
+        StartTime = time.perf_counter()
+        Results = Graders.Run(ImageName, [{} for Job in range(NumberOfJobs)])
+        Skeleton.Output.Print("Ran", len(Results), "jobs in {:.3f}s".format(time.perf_counter() - StartTime))
+        Skeleton.Output.Print("Registers:", Results[0][0], " Steps:", Results[0][2])
+        Graders.Close()
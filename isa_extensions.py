@@ -0,0 +1,106 @@
+# Instruction set extensions for the AQA AS 2023 skeleton program
+# the AND/ORR/XOR/NOT, ADD#/SUB#, LSL/LSR, BGT/BLT/BNE and CMP variants as opcode plugins
+# registered with Skeleton.RegisterOpCode instead of separate copies of the whole program
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+
+
+def GetShiftCount(Memory, Address):
+    return min(max(Memory[Address].OperandValue, 0), Skeleton.WORD_SIZE)
+
+
+def SetLogicalResult(Value, Registers):
+    Registers[Skeleton.ACC] = Value
+    return Skeleton.SetFlags(Value, Registers)
+
+
+def HandleAND(Memory, Registers, Operand):
+    return Memory, SetLogicalResult(Registers[Skeleton.ACC] & Memory[Operand].OperandValue, Registers)
+
+
+def HandleANDimm(Memory, Registers, Operand):
+    return Memory, SetLogicalResult(Registers[Skeleton.ACC] & Operand, Registers)
+
+
+def HandleORR(Memory, Registers, Operand):
+    return Memory, SetLogicalResult(Registers[Skeleton.ACC] | Memory[Operand].OperandValue, Registers)
+
+
+def HandleORRimm(Memory, Registers, Operand):
+    return Memory, SetLogicalResult(Registers[Skeleton.ACC] | Operand, Registers)
+
+
+def HandleXOR(Memory, Registers, Operand):
+    return Memory, SetLogicalResult(Registers[Skeleton.ACC] ^ Memory[Operand].OperandValue, Registers)
+
+
+def HandleXORimm(Memory, Registers, Operand):
+    return Memory, SetLogicalResult(Registers[Skeleton.ACC] ^ Operand, Registers)
+
+
+def HandleNOT(Memory, Registers, Operand):
+    return Memory, SetLogicalResult(~Registers[Skeleton.ACC], Registers)
+
+
+def HandleADDimm(Memory, Registers, Operand):
+    return Memory, Skeleton.SetArithmeticResult(Registers[Skeleton.ACC] + Operand, Registers)
+
+
+def HandleSUBimm(Memory, Registers, Operand):
+    return Memory, Skeleton.SetArithmeticResult(Registers[Skeleton.ACC] - Operand, Registers)
+
+
+def HandleLSL(Memory, Registers, Operand):
+    Value = Skeleton.WrapToWord(Registers[Skeleton.ACC] << GetShiftCount(Memory, Operand))
+    return Memory, SetLogicalResult(Value, Registers)
+
+
+def HandleLSR(Memory, Registers, Operand):
+    Value = Skeleton.WrapToWord((Registers[Skeleton.ACC] & Skeleton.WORD_MASK) >> GetShiftCount(Memory, Operand))
+    return Memory, SetLogicalResult(Value, Registers)
+
+
+def HandleCMP(Memory, Registers, Operand):
+    return Memory, Skeleton.SetFlags(Registers[Skeleton.ACC] - Memory[Operand].OperandValue, Registers)
+
+
+def HandleBGT(Memory, Registers, Operand):
+    if Registers[Skeleton.STATUS] & (Skeleton.FLAG_Z | Skeleton.FLAG_N) == 0:
+        Registers[Skeleton.PC] = Operand
+    return Memory, Registers
+
+
+def HandleBLT(Memory, Registers, Operand):
+    if Registers[Skeleton.STATUS] & Skeleton.FLAG_N:
+        Registers[Skeleton.PC] = Operand
+    return Memory, Registers
+
+
+def HandleBNE(Memory, Registers, Operand):
+    if not Registers[Skeleton.STATUS] & Skeleton.FLAG_Z:
+        Registers[Skeleton.PC] = Operand
+    return Memory, Registers
+
+
+def InstallExtensions():
+    Direct = Skeleton.ADDRESS_DIRECT
+    Immediate = Skeleton.ADDRESS_IMMEDIATE
+    Read = Skeleton.ACCESS_READ
+    for Mnemonic, Handler in (("AND", HandleAND), ("ORR", HandleORR), ("XOR", HandleXOR)):
+        Skeleton.RegisterOpCode(Mnemonic, Direct, Handler, MemoryAccess=Read, ChangesAcc=True,
+                                ValidateOperand=Skeleton.IsAddress)
+    for Mnemonic, Handler in (("AND#", HandleANDimm), ("ORR#", HandleORRimm), ("XOR#", HandleXORimm),
+                              ("ADD#", HandleADDimm), ("SUB#", HandleSUBimm)):
+        Skeleton.RegisterOpCode(Mnemonic, Immediate, Handler, ChangesAcc=True, ValidateOperand=Skeleton.IsWord)
+    Skeleton.RegisterOpCode("NOT", Skeleton.ADDRESS_NONE, HandleNOT, ChangesAcc=True)
+    for Mnemonic, Handler in (("LSL", HandleLSL), ("LSR", HandleLSR)):
+        Skeleton.RegisterOpCode(Mnemonic, Direct, Handler, MemoryAccess=Read, ChangesAcc=True,
+                                ValidateOperand=Skeleton.IsAddress)
+    Skeleton.RegisterOpCode("CMP", Direct, HandleCMP, MemoryAccess=Read, ValidateOperand=Skeleton.IsAddress)
+    for Mnemonic, Handler in (("BGT", HandleBGT), ("BLT", HandleBLT), ("BNE", HandleBNE)):
+        Skeleton.RegisterOpCode(Mnemonic, Direct, Handler, Flow=Skeleton.FLOW_BRANCH, ValidateOperand=Skeleton.IsAddress)
+
+
+if __name__ == "__main__":
+    InstallExtensions()
+    Skeleton.AssemblerSimulator()
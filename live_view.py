@@ -0,0 +1,153 @@
+# Curses live view for the AQA AS 2023 skeleton program
+# the program runs in ExecuteSteps batches while the listing, registers and stack are redrawn
+# at most REFRESH_RATE times a second, so the run is not held up by the terminal
+# keys: space pause/continue, s single step (while paused), + and - speed, q quit
+
+import curses
+import sys
+import time
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+from output_sink import MemorySink
+
+REFRESH_RATE = 30
+SPEEDS = (1, 5, 25, 100, 1000, 10000, None)
+FULL_SPEED_BATCH = 1000
+STATE_ROWS = 6
+
+
+class LiveView:
+    def __init__(self, Screen, SourceCode, Memory, StepLimit=Skeleton.STEP_LIMIT):
+        self.Screen = Screen
+        self.SourceCode = SourceCode
+        self.Memory = Memory
+        self.StepLimit = StepLimit
+        self.Registers = Skeleton.ResetRegisters(Memory)
+        self.Messages = MemorySink()
+        self.StepCount = 0
+        self.SpeedIndex = 3
+        self.StepsOwed = 0.0
+        self.Paused = False
+        self.Finished = False
+        self.Quit = False
+
+    def Advance(self, MaxSteps):
+        MaxSteps = min(MaxSteps, self.StepLimit - self.StepCount)
+        PreviousSink = Skeleton.SetOutputSink(self.Messages)
+        try:
+            self.Memory, self.Registers, Steps = Skeleton.ExecuteSteps(self.Memory, self.Registers, MaxSteps)
+            self.StepCount += Steps
+            if self.Registers[Skeleton.ERR] != 0 or self.Memory[self.Registers[Skeleton.PC]].OpCode == "HLT":
+                self.Finished = True
+            elif self.StepCount >= self.StepLimit:
+                self.Registers = Skeleton.ReportRunTimeError("Step limit reached", self.Registers,
+                                                             Skeleton.ERROR_STEP_LIMIT)
+                self.Finished = True
+        finally:
+            Skeleton.SetOutputSink(PreviousSink)
+
+    def RunUntil(self, DrawTime):
+        Speed = SPEEDS[self.SpeedIndex]
+        if Speed is None:
+            while not self.Finished and time.perf_counter() < DrawTime:
+                self.Advance(FULL_SPEED_BATCH)
+        else:
+            self.StepsOwed += Speed / REFRESH_RATE
+            if self.StepsOwed >= 1:
+                self.Advance(int(self.StepsOwed))
+                self.StepsOwed -= int(self.StepsOwed)
+
+    def GetStatus(self):
+        if self.Finished:
+            return "FINISHED"
+        if self.Paused:
+            return "PAUSED"
+        return "RUNNING"
+
+    def DrawLine(self, Row, Text, Attribute=curses.A_NORMAL):
+        Height, Width = self.Screen.getmaxyx()
+        if Row < Height:
+            self.Screen.addnstr(Row, 0, Text, Width - 1, Attribute)
+
+    def Draw(self):
+        Height, Width = self.Screen.getmaxyx()
+        NumberOfLines = int(self.SourceCode[0])
+        Registers = self.Registers
+        Speed = SPEEDS[self.SpeedIndex]
+        if Speed is None:
+            Speed = "full"
+        self.Screen.erase()
+        self.DrawLine(0, "Steps: {}  Speed: {} steps/s  {}   space pause  s step  +/- speed  q quit".format(
+            self.StepCount, Speed, self.GetStatus()), curses.A_BOLD)
+        self.DrawLine(1, "*  Memory     Location  Label  Op   Operand Comment")
+        ListingRows = max(1, Height - STATE_ROWS - 2)
+        First = max(0, min(Registers[Skeleton.PC] - ListingRows // 2, NumberOfLines + 1 - ListingRows))
+        Last = min(NumberOfLines, First + ListingRows - 1)
+        for Location in range(First, Last + 1):
+            Row = Skeleton.FormatMemoryLocation(self.Memory, Location)
+            if Location == 0:
+                Row = Row + "   0  |"
+            else:
+                Row = Row + Skeleton.FormatSourceCodeLine(self.SourceCode, Location)
+            Attribute = curses.A_NORMAL
+            if Location == Registers[Skeleton.PC]:
+                Attribute = curses.A_REVERSE
+            self.DrawLine(2 + Location - First, Row, Attribute)
+        Row = 3 + Last - First
+        self.DrawLine(Row, "*  PC: {}  ACC: {}  TOS: {}".format(Registers[Skeleton.PC], Registers[Skeleton.ACC],
+                                                                Registers[Skeleton.TOS]))
+        self.DrawLine(Row + 1, "*  Status Register: {} {}".format(
+            Skeleton.STATUS_LABEL, Skeleton.ConvertToBinary(Registers[Skeleton.STATUS], len(Skeleton.STATUS_LABEL))))
+        self.DrawLine(Row + 2, "*  Stack: " + " ".join(str(Value) for Value in
+                                                       Skeleton.GetStackContents(self.Memory, Registers)))
+        Lines = self.Messages.GetLines()
+        if len(Lines) > 0:
+            self.DrawLine(Row + 3, Lines[-1])
+        self.Screen.refresh()
+
+    def HandleKey(self, Key):
+        if Key == ord('q'):
+            self.Quit = True
+        elif Key == ord(' '):
+            self.Paused = not self.Paused
+        elif Key == ord('s'):
+            self.Paused = True
+            if not self.Finished:
+                self.Advance(1)
+        elif Key == ord('+') and self.SpeedIndex < len(SPEEDS) - 1:
+            self.SpeedIndex += 1
+        elif Key == ord('-') and self.SpeedIndex > 0:
+            self.SpeedIndex -= 1
+
+    def Run(self):
+        Interval = 1.0 / REFRESH_RATE
+        curses.curs_set(0)
+        DrawTime = time.perf_counter()
+        while not self.Quit:
+            Now = time.perf_counter()
+            if Now >= DrawTime:
+                self.Draw()
+                DrawTime = Now + Interval
+                if not self.Paused and not self.Finished:
+                    self.RunUntil(DrawTime)
+            if self.Paused or self.Finished or SPEEDS[self.SpeedIndex] is not None:
+                self.Screen.timeout(max(0, int((DrawTime - time.perf_counter()) * 1000)))
+            else:
+                self.Screen.timeout(0)
+            Key = self.Screen.getch()
+            if Key != -1:
+                self.HandleKey(Key)
+                DrawTime = time.perf_counter()
+        return self.Memory, self.Registers, self.StepCount
+
+
+def RunLiveView(SourceCode, Memory, StepLimit=Skeleton.STEP_LIMIT):
+    return curses.wrapper(lambda Screen: LiveView(Screen, SourceCode, Memory, StepLimit).Run())
+
+
+if __name__ == "__main__":
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(sys.argv[1])
+    if Memory[0].OpCode != "ERR":
+        Memory, Registers, StepCount = RunLiveView(SourceCode, Memory)
+        Skeleton.Output.Print("Steps:", StepCount, " PC:", Registers[Skeleton.PC], " ACC:", Registers[Skeleton.ACC],
+                              " Error:", Registers[Skeleton.ERR])
@@ -0,0 +1,70 @@
+# Load test client for simulation_server.py
+# opens many concurrent sessions, each loading, assembling and running a program,
+# and reports how long the sessions took
+
+import argparse
+import asyncio
+import json
+import time
+
+import simulation_server
+
+
+async def SendRequest(Reader, Writer, Request):
+    Writer.write((json.dumps(Request) + "\n").encode())
+    await Writer.drain()
+    return json.loads(await Reader.readline())
+
+
+async def RunClient(Host, Port, UnixPath, ProgramText, Runs):
+    if UnixPath is not None:
+        Reader, Writer = await asyncio.open_unix_connection(UnixPath)
+    else:
+        Reader, Writer = await asyncio.open_connection(Host, Port)
+    StartTime = time.perf_counter()
+    await SendRequest(Reader, Writer, {"op": "L", "text": ProgramText})
+    await SendRequest(Reader, Writer, {"op": "A"})
+    Reply = None
+    for Run in range(Runs):
+        Reply = await SendRequest(Reader, Writer, {"op": "R"})
+    Writer.write((json.dumps({"op": "X"}) + "\n").encode())
+    await Writer.drain()
+    Writer.close()
+    return time.perf_counter() - StartTime, Reply
+
+
+async def RunLoadTest(Arguments):
+    Server = None
+    if Arguments.local:
+        Server = await simulation_server.StartServer(Arguments.host, 0, None, Arguments.slice)
+        Arguments.port = Server.sockets[0].getsockname()[1]
+    FileIn = open(Arguments.program + ".txt", 'r')
+    ProgramText = FileIn.read()
+    FileIn.close()
+    StartTime = time.perf_counter()
+    Results = await asyncio.gather(*[RunClient(Arguments.host, Arguments.port, Arguments.unix, ProgramText, Arguments.runs)
+                                     for Client in range(Arguments.sessions)])
+    TotalTime = time.perf_counter() - StartTime
+    if Server is not None:
+        Server.close()
+        await Server.wait_closed()
+    Latencies = sorted([Latency for Latency, Reply in Results])
+    Failed = len([Reply for Latency, Reply in Results if Reply is None or "steps" not in Reply])
+    print("Sessions:", Arguments.sessions, " Runs per session:", Arguments.runs, " Failed:", Failed)
+    print("Total time: {:.3f}s".format(TotalTime))
+    print("Session time: min {:.4f}s  median {:.4f}s  max {:.4f}s".format(
+        Latencies[0], Latencies[len(Latencies) // 2], Latencies[-1]))
+    print("Last reply:", Results[-1][1])
+
+
+if __name__ == "__main__":
+    Parser = argparse.ArgumentParser(description="Simulate many concurrent simulator sessions")
+    Parser.add_argument("program", help="program file to run, without .txt")
+    Parser.add_argument("--sessions", type=int, default=200)
+    Parser.add_argument("--runs", type=int, default=1)
+    Parser.add_argument("--host", default="127.0.0.1")
+    Parser.add_argument("--port", type=int, default=8023)
+    Parser.add_argument("--unix", default=None)
+    Parser.add_argument("--local", action="store_true", help="start a server in this process")
+    Parser.add_argument("--slice", type=int, default=simulation_server.SLICE_STEPS)
+    asyncio.run(RunLoadTest(Parser.parse_args()))
@@ -0,0 +1,84 @@
+# Output sinks for the AQA AS 2023 skeleton program
+# every display routine writes through one sink so output can go to the terminal,
+# a buffered file, memory (for checking output) or nowhere at all
+
+import sys
+
+FLUSH_ON_INPUT = "input"
+FLUSH_ON_FRAME = "frame"
+FLUSH_ON_END = "end"
+
+
+class OutputSink:
+    def __init__(self, FlushPoints=(FLUSH_ON_INPUT, FLUSH_ON_END)):
+        self.FlushPoints = set(FlushPoints)
+
+    def Write(self, Text):
+        pass
+
+    def Print(self, *Values, End="\n"):
+        self.Write(" ".join([str(Value) for Value in Values]) + End)
+
+    def Flush(self):
+        pass
+
+    def FlushAt(self, FlushPoint):
+        if FlushPoint in self.FlushPoints:
+            self.Flush()
+
+    def Close(self):
+        self.Flush()
+
+
+class TerminalSink(OutputSink):
+    def Write(self, Text):
+        sys.stdout.write(Text)
+
+    def Flush(self):
+        sys.stdout.flush()
+
+
+class NullSink(OutputSink):
+    def Print(self, *Values, End="\n"):
+        pass
+
+
+class MemorySink(OutputSink):
+    def __init__(self, FlushPoints=()):
+        super().__init__(FlushPoints)
+        self.Parts = []
+
+    def Write(self, Text):
+        self.Parts.append(Text)
+
+    def GetText(self):
+        return "".join(self.Parts)
+
+    def GetLines(self):
+        return self.GetText().splitlines()
+
+    def Clear(self):
+        self.Parts = []
+
+
+class BufferedFileSink(OutputSink):
+    def __init__(self, FileName, FlushEvery=1000, FlushPoints=(FLUSH_ON_END,)):
+        super().__init__(FlushPoints)
+        self.FileOut = open(FileName, 'w')
+        self.FlushEvery = FlushEvery
+        self.Parts = []
+
+    def Write(self, Text):
+        self.Parts.append(Text)
+        if len(self.Parts) >= self.FlushEvery:
+            self.Flush()
+
+    def Flush(self):
+        if len(self.Parts) > 0:
+            self.FileOut.write("".join(self.Parts))
+            self.Parts = []
+        self.FileOut.flush()
+
+    def Close(self):
+        self.Flush()
+        self.FileOut.close()
@@ -0,0 +1,166 @@
+# Peephole optimiser for programs assembled by the AQA AS 2023 skeleton program
+# removes SKP, JMP to the next line, LDA X straight after STA X and BEQ that constant
+# propagation shows is never taken, compacts Memory
+# and keeps a PcMap (new address -> original source line) for listings and traces
+
+import sys
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+import program_analysis
+from output_sink import NullSink
+
+FLAG_SETTING_OPCODES = ("LDA", "LDA#", "ADD", "SUB")
+
+
+class OptimisedProgram:
+    def __init__(self):
+        self.Memory = []
+        self.PcMap = []
+        self.LineMap = {}
+        self.NumberOfLines = 0
+        self.RemovedLines = []
+
+
+def NextKeptLine(Location, Removed, NumberOfLines):
+    while Location in Removed and Location <= NumberOfLines:
+        Location += 1
+    return Location
+
+
+def PreviousKeptLine(Location, Removed):
+    Location -= 1
+    while Location in Removed:
+        Location -= 1
+    return Location
+
+
+def FindKeptTargets(BranchTargets, Removed, NumberOfLines):
+    return set(NextKeptLine(Target, Removed, NumberOfLines) for Target in BranchTargets)
+
+
+def IsRedundantLoad(Memory, Location, Removed, Targets):
+    if Memory[Location].OpCode != "LDA" or Location in Targets:
+        return False
+    Store = PreviousKeptLine(Location, Removed)
+    if Store < 1 or Memory[Store].OpCode != "STA" or Store in Targets:
+        return False
+    if Memory[Store].OperandValue != Memory[Location].OperandValue:
+        return False
+    FlagSource = Memory[PreviousKeptLine(Store, Removed)].OpCode
+    if Skeleton.OVERFLOW_POLICY != Skeleton.POLICY_TRAP and FlagSource in ("ADD", "SUB"):
+        return False
+    return FlagSource in FLAG_SETTING_OPCODES
+
+
+def IsNeverTaken(Location, DecidedBranches, BranchTargets):
+    return DecidedBranches.get(Location) is False and Location not in BranchTargets
+
+
+def FindRemovableLines(Memory, NumberOfLines, DecidedBranches):
+    Removed = set()
+    DataReferences = program_analysis.FindMemoryAccesses(
+        Memory, range(0, NumberOfLines + 1),
+        program_analysis.GetMemoryOpCodes(Skeleton.ACCESS_READ) + program_analysis.GetMemoryOpCodes(Skeleton.ACCESS_WRITE))
+    BranchTargets = program_analysis.FindBranchTargets(Memory, range(0, NumberOfLines + 1))
+    Changed = True
+    while Changed:
+        Changed = False
+        Targets = FindKeptTargets(BranchTargets, Removed, NumberOfLines)
+        for Location in range(1, NumberOfLines + 1):
+            if Location in Removed or Location in DataReferences:
+                continue
+            OpCode = Memory[Location].OpCode
+            if OpCode == "SKP":
+                Remove = True
+            elif OpCode == "JMP":
+                Target = NextKeptLine(Memory[Location].OperandValue, Removed, NumberOfLines)
+                Remove = Target == NextKeptLine(Location + 1, Removed, NumberOfLines)
+            elif OpCode == "BEQ":
+                Remove = IsNeverTaken(Location, DecidedBranches, BranchTargets)
+            else:
+                Remove = IsRedundantLoad(Memory, Location, Removed, Targets)
+            if Remove:
+                Removed.add(Location)
+                Changed = True
+                Targets = FindKeptTargets(BranchTargets, Removed, NumberOfLines)
+    return Removed
+
+
+def OptimiseProgram(SourceCode, Memory):
+    NumberOfLines = int(SourceCode[0])
+    Program = OptimisedProgram()
+    Analysis = program_analysis.AnalyseProgram(SourceCode, Memory)
+    Removed = set()
+    if len(Analysis.SelfModifyingLines) == 0:
+        Removed = FindRemovableLines(Memory, NumberOfLines, Analysis.DecidedBranches)
+    for Location in range(0, NumberOfLines + 1):
+        if Location not in Removed:
+            Program.LineMap[Location] = len(Program.PcMap)
+            Program.PcMap.append(Location)
+    Program.NumberOfLines = len(Program.PcMap) - 1
+    for Location in sorted(Removed):
+        Program.LineMap[Location] = Program.NumberOfLines + 1
+        NextLine = NextKeptLine(Location, Removed, NumberOfLines)
+        if NextLine in Program.LineMap:
+            Program.LineMap[Location] = Program.LineMap[NextLine]
+    Program.RemovedLines = sorted(Removed)
+    Program.Memory = Skeleton.CreateMemory(len(Memory))
+    for Address in range(len(Program.PcMap)):
+        Original = Memory[Program.PcMap[Address]]
+        Program.Memory[Address].OpCode = Original.OpCode
+        Program.Memory[Address].OperandString = Original.OperandString
+        Program.Memory[Address].OperandValue = Original.OperandValue
+        if Original.OpCode in Skeleton.ADDRESS_OPCODES and Original.OperandValue in Program.LineMap:
+            Program.Memory[Address].OperandValue = Program.LineMap[Original.OperandValue]
+    return Program
+
+
+def VerifyOptimisation(SourceCode, Memory, Program):
+    NumberOfLines = int(SourceCode[0])
+    PreviousSink = Skeleton.SetOutputSink(NullSink())
+    Original, OriginalRegisters, OriginalSteps = Skeleton.ExecuteHeadless(Skeleton.CopyMemory(Memory))
+    Optimised, OptimisedRegisters, OptimisedSteps = Skeleton.ExecuteHeadless(Skeleton.CopyMemory(Program.Memory))
+    Skeleton.SetOutputSink(PreviousSink)
+    ExpectedPc = OriginalRegisters[Skeleton.PC]
+    if ExpectedPc in Program.LineMap:
+        ExpectedPc = Program.LineMap[ExpectedPc]
+    elif ExpectedPc == NumberOfLines + 1:
+        ExpectedPc = Program.NumberOfLines + 1
+    Matches = OptimisedRegisters[Skeleton.PC] == ExpectedPc
+    for Register in (Skeleton.ACC, Skeleton.STATUS, Skeleton.TOS, Skeleton.ERR):
+        if OptimisedRegisters[Register] != OriginalRegisters[Register]:
+            Matches = False
+    for Location in range(1, NumberOfLines + 1):
+        if not program_analysis.IsInstruction(Memory, Location):
+            if Optimised[Program.LineMap[Location]].OperandValue != Original[Location].OperandValue:
+                Matches = False
+    for Location in range(NumberOfLines + 1, len(Memory)):
+        if Optimised[Location].OperandValue != Original[Location].OperandValue:
+            Matches = False
+    return Matches, OriginalSteps, OptimisedSteps
+
+
+def RunFile(FileName, Optimise=True):
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(FileName)
+    if Memory[0].OpCode == "ERR":
+        return
+    elif not Optimise:
+        Skeleton.Execute(SourceCode, Memory)
+    else:
+        Program = OptimiseProgram(SourceCode, Memory)
+        Matches, OriginalSteps, OptimisedSteps = VerifyOptimisation(SourceCode, Memory, Program)
+        Skeleton.Output.Print("Removed lines:", Program.RemovedLines)
+        Skeleton.Output.Print("Steps:", OriginalSteps, "->", OptimisedSteps)
+        if not Matches:
+            Skeleton.Output.Print("Optimised program does not match the original, running unoptimised")
+            Skeleton.Execute(SourceCode, Memory)
+        else:
+            Skeleton.Execute(SourceCode, Program.Memory, Program.PcMap)
+
+
+if __name__ == "__main__":
+    Arguments = sys.argv[1:]
+    OptimiseRun = "--no-optimise" not in Arguments
+    for Argument in Arguments:
+        if Argument != "--no-optimise":
+            RunFile(Argument, OptimiseRun)
@@ -0,0 +1,212 @@
+# Static analysis pass for programs assembled by the AQA AS 2023 skeleton program
+# builds a control flow graph from the assembled Memory, finds unreachable lines and
+# unread data cells and propagates constant ACC values through straight-line arithmetic
+
+import sys
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+
+DATA_OPCODES = ("   ", Skeleton.EMPTY_STRING)
+UNKNOWN = None
+
+
+class ProgramAnalysis:
+    def __init__(self):
+        self.NumberOfLines = 0
+        self.Successors = {}
+        self.Reachable = set()
+        self.UnreachableLines = []
+        self.DataCells = []
+        self.UnreadDataCells = []
+        self.WrittenCells = set()
+        self.SelfModifyingLines = []
+        self.ConstantAcc = {}
+        self.AlwaysOverflows = []
+        self.DecidedBranches = {}
+
+
+def IsInstruction(Memory, Location):
+    return Memory[Location].OpCode not in DATA_OPCODES
+
+
+def IsDataCell(Memory, Location):
+    return Memory[Location].OpCode == "   " and Memory[Location].OperandString != Skeleton.EMPTY_STRING
+
+
+def GetMemoryOpCodes(MemoryAccess):
+    return [Mnemonic for Mnemonic in Skeleton.OPCODES if Skeleton.OPCODES[Mnemonic].MemoryAccess == MemoryAccess]
+
+
+def GetFlow(OpCode):
+    if OpCode in Skeleton.OPCODES:
+        return Skeleton.OPCODES[OpCode].Flow
+    return Skeleton.FLOW_NEXT
+
+
+def GetSuccessors(Memory, Location, NumberOfLines):
+    Flow = GetFlow(Memory[Location].OpCode)
+    Operand = Memory[Location].OperandValue
+    NextLine = Location + 1
+    if Flow == Skeleton.FLOW_HALT or Flow == Skeleton.FLOW_RETURN:
+        Successors = []
+    elif Flow == Skeleton.FLOW_JUMP:
+        Successors = [Operand]
+    elif Flow == Skeleton.FLOW_BRANCH or Flow == Skeleton.FLOW_CALL:
+        Successors = [Operand, NextLine]
+    else:
+        Successors = [NextLine]
+    return [Line for Line in Successors if 0 <= Line <= NumberOfLines]
+
+
+def BuildControlFlowGraph(Memory, NumberOfLines):
+    Successors = {}
+    for Location in range(0, NumberOfLines + 1):
+        Successors[Location] = GetSuccessors(Memory, Location, NumberOfLines)
+    return Successors
+
+
+def FindReachableLines(Successors):
+    Reachable = set()
+    ToVisit = [0]
+    while len(ToVisit) > 0:
+        Location = ToVisit.pop()
+        if Location not in Reachable:
+            Reachable.add(Location)
+            ToVisit.extend(Successors[Location])
+    return Reachable
+
+
+def FindMemoryAccesses(Memory, Reachable, OpCodes):
+    Accessed = set()
+    for Location in Reachable:
+        if Memory[Location].OpCode in OpCodes:
+            Accessed.add(Memory[Location].OperandValue)
+    return Accessed
+
+
+def FindBranchTargets(Memory, Locations):
+    Targets = set()
+    for Location in Locations:
+        Flow = GetFlow(Memory[Location].OpCode)
+        if Flow in (Skeleton.FLOW_JUMP, Skeleton.FLOW_BRANCH, Skeleton.FLOW_CALL):
+            Targets.add(Memory[Location].OperandValue)
+        if Flow == Skeleton.FLOW_CALL:
+            Targets.add(Location + 1)
+    return Targets
+
+
+def ApplyInstruction(Memory, Location, Acc, Analysis):
+    OpCode = Memory[Location].OpCode
+    Operand = Memory[Location].OperandValue
+    if OpCode == "LDA#":
+        return Operand
+    if OpCode == "JSR":
+        return UNKNOWN
+    if OpCode not in ("LDA", "ADD", "SUB"):
+        if OpCode in Skeleton.OPCODES and Skeleton.OPCODES[OpCode].ChangesAcc:
+            return UNKNOWN
+        return Acc
+    if Operand in Analysis.WrittenCells or not 0 <= Operand <= Analysis.NumberOfLines:
+        return UNKNOWN
+    Value = Memory[Operand].OperandValue
+    if OpCode == "LDA":
+        return Value
+    if Acc is UNKNOWN:
+        return UNKNOWN
+    if OpCode == "ADD":
+        Result = Acc + Value
+    else:
+        Result = Acc - Value
+    if Result > Skeleton.MAX_INT or Result < Skeleton.MIN_INT:
+        Analysis.AlwaysOverflows.append(Location)
+        return UNKNOWN
+    return Result
+
+
+def PropagateConstants(Memory, Analysis):
+    AccIn = {0: 0}
+    ToVisit = [0]
+    while len(ToVisit) > 0:
+        Location = ToVisit.pop()
+        AccOut = ApplyInstruction(Memory, Location, AccIn[Location], Analysis)
+        for Successor in Analysis.Successors[Location]:
+            if Successor not in AccIn:
+                AccIn[Successor] = AccOut
+                ToVisit.append(Successor)
+            elif AccIn[Successor] is not UNKNOWN and AccIn[Successor] != AccOut:
+                AccIn[Successor] = UNKNOWN
+                ToVisit.append(Successor)
+    Analysis.AlwaysOverflows = []
+    for Location in sorted(AccIn):
+        AccOut = ApplyInstruction(Memory, Location, AccIn[Location], Analysis)
+        if AccOut is not UNKNOWN:
+            Analysis.ConstantAcc[Location] = AccOut
+    for Location in range(1, Analysis.NumberOfLines):
+        if Memory[Location].OpCode == "CMP#" and Memory[Location + 1].OpCode == "BEQ":
+            if Location in AccIn and AccIn[Location] is not UNKNOWN and Location in Analysis.Reachable:
+                Taken = AccIn[Location] == Memory[Location].OperandValue
+                Analysis.DecidedBranches[Location + 1] = Taken
+    return Analysis
+
+
+def AnalyseProgram(SourceCode, Memory):
+    Analysis = ProgramAnalysis()
+    NumberOfLines = int(SourceCode[0])
+    Analysis.NumberOfLines = NumberOfLines
+    Analysis.Successors = BuildControlFlowGraph(Memory, NumberOfLines)
+    Analysis.Reachable = FindReachableLines(Analysis.Successors)
+    for Location in range(1, NumberOfLines + 1):
+        if IsDataCell(Memory, Location):
+            Analysis.DataCells.append(Location)
+        elif IsInstruction(Memory, Location) and Location not in Analysis.Reachable:
+            Analysis.UnreachableLines.append(Location)
+    ReadCells = FindMemoryAccesses(Memory, Analysis.Reachable, GetMemoryOpCodes(Skeleton.ACCESS_READ))
+    Analysis.WrittenCells = FindMemoryAccesses(Memory, Analysis.Reachable, GetMemoryOpCodes(Skeleton.ACCESS_WRITE))
+    Analysis.UnreadDataCells = [Location for Location in Analysis.DataCells if Location not in ReadCells]
+    Analysis.SelfModifyingLines = sorted(Location for Location in Analysis.WrittenCells
+                                         if 0 <= Location <= NumberOfLines and IsInstruction(Memory, Location))
+    return PropagateConstants(Memory, Analysis)
+
+
+def CreateLintReport(SourceCode, Analysis):
+    Report = []
+    for Location in Analysis.UnreachableLines:
+        Report.append("Line {:>3d}: unreachable code  {}".format(Location, SourceCode[Location].strip()))
+    for Location in Analysis.UnreadDataCells:
+        Report.append("Line {:>3d}: data is never read  {}".format(Location, SourceCode[Location].strip()))
+    for Location in Analysis.SelfModifyingLines:
+        Report.append("Line {:>3d}: instruction is overwritten by STA".format(Location))
+    for Location in Analysis.AlwaysOverflows:
+        Report.append("Line {:>3d}: arithmetic always overflows".format(Location))
+    for Location in sorted(Analysis.DecidedBranches):
+        if Analysis.DecidedBranches[Location]:
+            Report.append("Line {:>3d}: branch is always taken".format(Location))
+        else:
+            Report.append("Line {:>3d}: branch is never taken".format(Location))
+    return Report
+
+
+def DisplayLintReport(SourceCode, Analysis):
+    Skeleton.Output.Print()
+    Skeleton.Output.Print("Lint report")
+    Skeleton.Output.Print("===========")
+    Report = CreateLintReport(SourceCode, Analysis)
+    if len(Report) == 0:
+        Skeleton.Output.Print("No problems found")
+    for Line in Report:
+        Skeleton.Output.Print(Line)
+    Skeleton.Output.Print()
+
+
+def LintFile(FileName):
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(FileName)
+    if Memory[0].OpCode == "ERR":
+        return None
+    Analysis = AnalyseProgram(SourceCode, Memory)
+    DisplayLintReport(SourceCode, Analysis)
+    return Analysis
+
+
+if __name__ == "__main__":
+    for Argument in sys.argv[1:]:
+        LintFile(Argument)
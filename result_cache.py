@@ -0,0 +1,137 @@
+# Memoised headless runs for the AQA AS 2023 skeleton program
+# results are keyed by a hash of the memory image, the start registers and the arithmetic,
+# stack and opcode configuration; an LRU in memory with an optional directory of JSON files
+
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+from output_sink import MemorySink
+
+MAX_ENTRIES = 256
+
+
+class RunResult:
+    __slots__ = ("Registers", "Image", "StepCount", "Messages")
+
+    def __init__(self, Registers, Image, StepCount, Messages):
+        self.Registers = Registers
+        self.Image = Image
+        self.StepCount = StepCount
+        self.Messages = Messages
+
+
+def CreateImage(Memory):
+    return [[Cell.OpCode, Cell.OperandValue, Cell.StackPointerValue] for Cell in Memory]
+
+
+def ApplyImage(Memory, Image):
+    for Location in range(len(Image)):
+        Memory[Location].OpCode, Memory[Location].OperandValue, Memory[Location].StackPointerValue = Image[Location]
+    return Memory
+
+
+def GetConfiguration(StepLimit):
+    OpCodes = []
+    for Mnemonic in sorted(Skeleton.OPCODE_HANDLERS):
+        Handler = Skeleton.OPCODE_HANDLERS[Mnemonic]
+        if Handler is not None:
+            Handler = Handler.__module__ + "." + Handler.__qualname__
+        OpCodes.append((Mnemonic, Handler))
+    return (Skeleton.WORD_SIZE, Skeleton.OVERFLOW_POLICY, Skeleton.STATUS_LABEL, StepLimit, OpCodes)
+
+
+def CreateKey(Memory, Registers, StepLimit):
+    Digest = hashlib.sha256()
+    Digest.update(repr(GetConfiguration(StepLimit)).encode())
+    Digest.update(repr(Registers).encode())
+    Digest.update(repr(CreateImage(Memory)).encode())
+    return Digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, MaxEntries=MAX_ENTRIES, Directory=None):
+        self.MaxEntries = MaxEntries
+        self.Directory = Directory
+        self.Entries = OrderedDict()
+        self.Hits = 0
+        self.Misses = 0
+        if Directory is not None:
+            os.makedirs(Directory, exist_ok=True)
+
+    def GetFileName(self, Key):
+        return os.path.join(self.Directory, Key + ".json")
+
+    def Lookup(self, Key):
+        if Key in self.Entries:
+            self.Entries.move_to_end(Key)
+            return self.Entries[Key]
+        if self.Directory is None or not os.path.exists(self.GetFileName(Key)):
+            return None
+        try:
+            FileIn = open(self.GetFileName(Key), 'r')
+            Fields = json.load(FileIn)
+            FileIn.close()
+        except (OSError, ValueError):
+            return None
+        Result = RunResult(Fields["registers"], Fields["image"], Fields["steps"], Fields["messages"])
+        self.Remember(Key, Result)
+        return Result
+
+    def Remember(self, Key, Result):
+        self.Entries[Key] = Result
+        self.Entries.move_to_end(Key)
+        while len(self.Entries) > self.MaxEntries:
+            self.Entries.popitem(last=False)
+
+    def Store(self, Key, Result):
+        self.Remember(Key, Result)
+        if self.Directory is not None:
+            TemporaryName = self.GetFileName(Key) + "." + str(os.getpid())
+            FileOut = open(TemporaryName, 'w')
+            json.dump({"registers": Result.Registers, "image": Result.Image, "steps": Result.StepCount,
+                       "messages": Result.Messages}, FileOut)
+            FileOut.close()
+            os.replace(TemporaryName, self.GetFileName(Key))
+
+    def Run(self, Memory, StepLimit=Skeleton.STEP_LIMIT):
+        Key = CreateKey(Memory, Skeleton.ResetRegisters(Memory), StepLimit)
+        Result = self.Lookup(Key)
+        if Result is None:
+            self.Misses += 1
+            Messages = MemorySink()
+            PreviousSink = Skeleton.SetOutputSink(Messages)
+            try:
+                Memory, Registers, StepCount = Skeleton.ExecuteHeadless(Memory, StepLimit)
+            finally:
+                Skeleton.SetOutputSink(PreviousSink)
+            Result = RunResult(list(Registers), CreateImage(Memory), StepCount, Messages.GetLines())
+            self.Store(Key, Result)
+        else:
+            self.Hits += 1
+            Memory = ApplyImage(Memory, Result.Image)
+        for Line in Result.Messages:
+            Skeleton.Output.Print(Line)
+        return Memory, list(Result.Registers), Result.StepCount
+
+    def Clear(self):
+        self.Entries.clear()
+
+
+if __name__ == "__main__":
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(sys.argv[1])
+    if Memory[0].OpCode != "ERR":
+        Directory = None
+        if len(sys.argv) > 2:
+            Directory = sys.argv[2]
+        Cache = ResultCache(Directory=Directory)
+        for Run in range(3):
+            StartTime = time.perf_counter()
+            Final, Registers, StepCount = Cache.Run(Skeleton.CopyMemory(Memory))
+            Skeleton.Output.Print("Run", Run + 1, "steps:", StepCount, "registers:", Registers,
+                                  "{:.6f}s".format(time.perf_counter() - StartTime))
+        Skeleton.Output.Print("Hits:", Cache.Hits, " Misses:", Cache.Misses)
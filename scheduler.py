@@ -0,0 +1,107 @@
+# Cooperative scheduler for running many assembled programs in one process
+# each MachineContext has its own memory, registers and frame counter; the scheduler
+# runs them round robin a few instructions at a time with the headless ExecuteSteps loop
+
+import sys
+from collections import deque
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+from output_sink import NullSink
+
+QUANTUM = 100
+
+
+class MachineContext:
+    def __init__(self, Name, Priority=1, StepBudget=Skeleton.STEP_LIMIT, OnComplete=None):
+        if Priority < 1:
+            raise ValueError("Priority must be at least 1")
+        self.Name = Name
+        self.SourceCode = []
+        self.Memory = []
+        self.Registers = []
+        self.FrameNumber = 0
+        self.Priority = Priority
+        self.StepBudget = StepBudget
+        self.OnComplete = OnComplete
+        self.Finished = False
+
+
+class Scheduler:
+    def __init__(self, Quantum=QUANTUM, Output=None):
+        if Output is None:
+            Output = NullSink()
+        if Quantum < 1:
+            raise ValueError("Quantum must be at least 1")
+        self.Quantum = Quantum
+        self.Output = Output
+        self.CallerOutput = None
+        self.Ready = deque()
+        self.Completed = []
+
+    def Add(self, Context):
+        self.Ready.append(Context)
+        return Context
+
+    def AddProgram(self, Name, ProgramText, Priority=1, StepBudget=Skeleton.STEP_LIMIT, OnComplete=None,
+                   MemorySize=Skeleton.HI_MEM):
+        Context = MachineContext(Name, Priority, StepBudget, OnComplete)
+        PreviousSink = Skeleton.SetOutputSink(self.Output)
+        Context.SourceCode = Skeleton.ReadSourceText(Skeleton.CreateSourceCode(MemorySize), ProgramText)
+        Context.Memory = Skeleton.CreateMemory(MemorySize)
+        Context.Registers = Skeleton.InitialiseRegisters(MemorySize)
+        if Context.SourceCode[0] == Skeleton.EMPTY_STRING:
+            Context.Registers[Skeleton.ERR] = Skeleton.ERROR_ASSEMBLY
+        else:
+            Context.Memory = Skeleton.Assemble(Context.SourceCode, Context.Memory)
+            Context.Registers = Skeleton.ResetRegisters(Context.Memory)
+            if Context.Memory[0].OpCode == "ERR":
+                Context.Registers[Skeleton.ERR] = Skeleton.ERROR_ASSEMBLY
+        Skeleton.SetOutputSink(PreviousSink)
+        return self.Add(Context)
+
+    def Complete(self, Context):
+        Context.Finished = True
+        self.Completed.append(Context)
+        if Context.OnComplete is not None:
+            SchedulerOutput = Skeleton.SetOutputSink(self.CallerOutput)
+            Context.OnComplete(Context)
+            Skeleton.SetOutputSink(SchedulerOutput)
+
+    def RunSlice(self, Context):
+        Registers = Context.Registers
+        if Registers[Skeleton.ERR] == 0 and Context.Memory[Registers[Skeleton.PC]].OpCode != "HLT":
+            Steps = min(self.Quantum * Context.Priority, Context.StepBudget - Context.FrameNumber)
+            Context.Memory, Context.Registers, StepCount = Skeleton.ExecuteSteps(Context.Memory, Registers, Steps)
+            Context.FrameNumber += StepCount
+        Registers = Context.Registers
+        if Registers[Skeleton.ERR] != 0 or Context.Memory[Registers[Skeleton.PC]].OpCode == "HLT":
+            return True
+        if Context.FrameNumber >= Context.StepBudget:
+            Context.Registers = Skeleton.ReportRunTimeError("Step limit reached", Registers, Skeleton.ERROR_STEP_LIMIT)
+            return True
+        return False
+
+    def Run(self):
+        self.CallerOutput = Skeleton.SetOutputSink(self.Output)
+        while len(self.Ready) > 0:
+            Context = self.Ready.popleft()
+            if self.RunSlice(Context):
+                self.Complete(Context)
+            else:
+                self.Ready.append(Context)
+        Skeleton.SetOutputSink(self.CallerOutput)
+        return self.Completed
+
+
+def DisplayResult(Context):
+    Skeleton.Output.Print("{:<20s} frames: {:<7d} ACC: {:<5d} error: {}".format(
+        Context.Name, Context.FrameNumber, Context.Registers[Skeleton.ACC], Context.Registers[Skeleton.ERR]))
+
+
+if __name__ == "__main__":
+    ThisScheduler = Scheduler()
+    for Argument in sys.argv[1:]:
+        FileIn = open(Argument + ".txt", 'r')
+        ThisScheduler.AddProgram(Argument, FileIn.read(), OnComplete=DisplayResult)
+        FileIn.close()
+    ThisScheduler.Run()
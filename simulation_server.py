@@ -0,0 +1,125 @@
+# Asyncio server that hosts one simulator session per connection
+# the protocol is one JSON object per line, e.g. {"op": "L", "text": "..."}, with the
+# same L/D/E/A/R/X operations as the menu in AssemblerSimulator()
+# long runs are time sliced so one student's loop cannot starve the other sessions
+
+import argparse
+import asyncio
+import json
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+from output_sink import MemorySink
+from simulator import Simulator
+
+SLICE_STEPS = 200
+REQUEST_FIELDS = {"op": str, "text": str, "line": (int, str)}
+
+
+class Session:
+    def __init__(self, SliceSteps=SLICE_STEPS, StepLimit=Skeleton.STEP_LIMIT):
+        self.Output = MemorySink()
+        self.Simulator = Simulator(self.Output)
+        self.SliceSteps = SliceSteps
+        self.StepLimit = StepLimit
+
+
+def CreateReply(Session, Ok, **Fields):
+    Reply = {"ok": Ok, "messages": Session.Output.GetLines()}
+    Reply.update(Fields)
+    Session.Output.Clear()
+    return Reply
+
+
+async def RunSession(Session):
+    Sim = Session.Simulator
+    Sim.reset_registers()
+    StepCount = 0
+    while not Sim.halted and StepCount < Session.StepLimit:
+        StepCount += Sim.run(min(Session.SliceSteps, Session.StepLimit - StepCount))
+        await asyncio.sleep(0)
+    if not Sim.halted:
+        Sim.report_error("Step limit reached", Skeleton.ERROR_STEP_LIMIT)
+    return StepCount
+
+
+def CheckRequest(Request):
+    if not isinstance(Request, dict):
+        raise TypeError("request must be a JSON object")
+    for Field in REQUEST_FIELDS:
+        if Field in Request and not isinstance(Request[Field], REQUEST_FIELDS[Field]):
+            raise TypeError("invalid type for field " + Field)
+
+
+async def HandleRequest(Session, Request):
+    CheckRequest(Request)
+    Sim = Session.Simulator
+    Operation = Request.get("op", Skeleton.EMPTY_STRING)
+    if Operation == 'L':
+        return CreateReply(Session, Sim.load_text(Request.get("text", Skeleton.EMPTY_STRING)))
+    elif Operation == 'D':
+        if len(Sim.source_lines) == 0:
+            Session.Output.Print("Error Code 7")
+            return CreateReply(Session, False)
+        return CreateReply(Session, True, source=Sim.source_lines)
+    elif Operation == 'E':
+        return CreateReply(Session, Sim.edit_line(int(Request.get("line", 0)), Request.get("text", Skeleton.EMPTY_STRING)))
+    elif Operation == 'A':
+        return CreateReply(Session, Sim.assemble())
+    elif Operation == 'R':
+        if Sim.Memory[0].OperandValue == 0:
+            Session.Output.Print("Error Code 10")
+            return CreateReply(Session, False)
+        elif not Sim.Assembled:
+            Session.Output.Print("Error Code 11")
+            return CreateReply(Session, False)
+        StepCount = await RunSession(Session)
+        return CreateReply(Session, not Sim.error, steps=StepCount, registers=Sim.registers, memory=Sim.memory)
+    Session.Output.Print("You did not choose a valid menu option. Try again")
+    return CreateReply(Session, False)
+
+
+async def HandleConnection(Reader, Writer, SliceSteps=SLICE_STEPS):
+    ThisSession = Session(SliceSteps)
+    try:
+        Line = await Reader.readline()
+        while Line:
+            try:
+                Request = json.loads(Line)
+            except ValueError:
+                Request = {}
+            if isinstance(Request, dict) and Request.get("op") == 'X':
+                break
+            try:
+                Reply = await HandleRequest(ThisSession, Request)
+            except (ValueError, TypeError) as Error:
+                Reply = CreateReply(ThisSession, False, error=str(Error))
+            Writer.write((json.dumps(Reply) + "\n").encode())
+            await Writer.drain()
+            Line = await Reader.readline()
+    except ConnectionError:
+        pass
+    finally:
+        Writer.close()
+
+
+async def StartServer(Host="127.0.0.1", Port=8023, UnixPath=None, SliceSteps=SLICE_STEPS):
+    async def Handler(Reader, Writer):
+        await HandleConnection(Reader, Writer, SliceSteps)
+    if UnixPath is not None:
+        return await asyncio.start_unix_server(Handler, path=UnixPath)
+    return await asyncio.start_server(Handler, Host, Port)
+
+
+async def ServeForever(Arguments):
+    Server = await StartServer(Arguments.host, Arguments.port, Arguments.unix, Arguments.slice)
+    async with Server:
+        await Server.serve_forever()
+
+
+if __name__ == "__main__":
+    Parser = argparse.ArgumentParser(description="Serve simulator sessions over TCP or a Unix socket")
+    Parser.add_argument("--host", default="127.0.0.1")
+    Parser.add_argument("--port", type=int, default=8023)
+    Parser.add_argument("--unix", default=None, help="listen on this Unix socket path instead of TCP")
+    Parser.add_argument("--slice", type=int, default=SLICE_STEPS, help="steps to run before yielding")
+    asyncio.run(ServeForever(Parser.parse_args()))
@@ -0,0 +1,118 @@
+# Programmatic interface to the AQA AS 2023 skeleton program
+# a Simulator holds its own source code, memory and registers and never reads stdin,
+# so it can be embedded in other programs (grading, servers, schedulers)
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+from output_sink import NullSink
+
+
+class Simulator:
+    __slots__ = ("SourceCode", "Memory", "Registers", "FrameNumber", "Output", "Assembled")
+
+    def __init__(self, output=None, memory_size=Skeleton.HI_MEM):
+        if output is None:
+            output = NullSink()
+        self.Output = output
+        self.SourceCode = Skeleton.CreateSourceCode(memory_size)
+        self.Memory = Skeleton.CreateMemory(memory_size)
+        self.Registers = Skeleton.InitialiseRegisters(memory_size)
+        self.FrameNumber = 0
+        self.Assembled = False
+
+    def _call(self, Function, *Arguments):
+        PreviousSink = Skeleton.Output
+        Skeleton.Output = self.Output
+        try:
+            return Function(*Arguments)
+        finally:
+            Skeleton.Output = PreviousSink
+
+    def load_text(self, text):
+        self.SourceCode = self._call(Skeleton.ReadSourceText, self.SourceCode, text)
+        self.Memory = Skeleton.ResetMemory(self.Memory)
+        self.Assembled = False
+        return self.SourceCode[0] != Skeleton.EMPTY_STRING
+
+    def load_file(self, file_name):
+        self.SourceCode = self._call(Skeleton.ReadSourceFile, self.SourceCode, file_name)
+        self.Memory = Skeleton.ResetMemory(self.Memory)
+        self.Assembled = False
+        return self.SourceCode[0] != Skeleton.EMPTY_STRING
+
+    def edit_line(self, line_number, text):
+        if self.SourceCode[0] == Skeleton.EMPTY_STRING or not 1 <= line_number <= int(self.SourceCode[0]):
+            self.Output.Print("Error Code 8")
+            return False
+        self.SourceCode[line_number] = text
+        self.Memory = Skeleton.ResetMemory(self.Memory)
+        self.Assembled = False
+        return True
+
+    def assemble(self):
+        if self.SourceCode[0] == Skeleton.EMPTY_STRING:
+            self.Output.Print("Error Code 9")
+            return False
+        self.Memory = self._call(Skeleton.Assemble, self.SourceCode, self.Memory)
+        self.Assembled = self.Memory[0].OpCode != "ERR"
+        self.reset_registers()
+        return self.Assembled
+
+    def reset_registers(self):
+        self.Registers = Skeleton.ResetRegisters(self.Memory)
+        self.FrameNumber = 0
+
+    def reset(self):
+        if self.Assembled:
+            return self.assemble()
+        self.reset_registers()
+        return False
+
+    def step(self):
+        return self.run(1) == 1
+
+    def run(self, max_steps=Skeleton.STEP_LIMIT):
+        if not self.Assembled or self.halted:
+            return 0
+        self.Memory, self.Registers, StepCount = self._call(
+            Skeleton.ExecuteSteps, self.Memory, self.Registers, max_steps)
+        self.FrameNumber += StepCount
+        return StepCount
+
+    def report_error(self, message, error_code):
+        self.Registers = self._call(Skeleton.ReportRunTimeError, message, self.Registers, error_code)
+
+    @property
+    def source_lines(self):
+        if self.SourceCode[0] == Skeleton.EMPTY_STRING:
+            return []
+        return self.SourceCode[1:int(self.SourceCode[0]) + 1]
+
+    @property
+    def halted(self):
+        return self.Registers[Skeleton.ERR] != 0 or self.Memory[self.Registers[Skeleton.PC]].OpCode == "HLT"
+
+    @property
+    def error(self):
+        return self.Registers[Skeleton.ERR] != 0
+
+    @property
+    def registers(self):
+        return {"PC": self.Registers[Skeleton.PC], "ACC": self.Registers[Skeleton.ACC],
+                "STATUS": self.Registers[Skeleton.STATUS], "TOS": self.Registers[Skeleton.TOS],
+                "ERR": self.Registers[Skeleton.ERR]}
+
+    @property
+    def stack_depth(self):
+        return Skeleton.GetStackDepth(self.Memory, self.Registers)
+
+    @property
+    def stack(self):
+        return Skeleton.GetStackContents(self.Memory, self.Registers)
+
+    @property
+    def max_stack_depth(self):
+        return self.Registers[Skeleton.MAX_DEPTH]
+
+    @property
+    def memory(self):
+        return [Cell.OperandValue for Cell in self.Memory]
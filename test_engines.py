@@ -0,0 +1,219 @@
+# Differential tests for the headless engines of the AQA AS 2023 skeleton program
+# every program is run by ExecuteHeadless, by each engine in ENGINES and as an exported module;
+# the final registers, memory and step count must match
+# run with: python -m unittest test_engines  (or python -m pytest test_engines.py)
+
+import tempfile
+import unittest
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+import aot_export
+import fast_engine
+import peephole
+import tracing_jit
+from output_sink import NullSink
+
+ENGINES = (fast_engine.ExecuteHeadlessFast, tracing_jit.ExecuteHeadlessTraced)
+PROGRAM_FILES = ("prog1", "prog2", "prog3", "prog4")
+STEP_LIMITS = (1, 2, 3, 7, 50, 333)
+STEP_LIMIT_PROGRAMS = ("load add store loop", "branch into a fused sequence", "counted loop", "counting down",
+                       "nested loops", "data cell inside a loop", "subroutine in a loop")
+
+PROGRAMS = {
+    "counted loop": """START: LDA# -120
+ LOOP: CMP# 117
+       BEQ  DONE
+       ADD  STEP
+       JMP  LOOP
+ DONE: STA  OUT
+       HLT
+ STEP:      3
+  OUT:      0""",
+    "counting down": """START: LDA# 100
+ LOOP: CMP# -50
+       BEQ  DONE
+       SUB  STEP
+       JMP  LOOP
+ DONE: HLT
+ STEP:      5""",
+    "overflow in a loop": """START: LDA# 1
+ LOOP: ADD  STEP
+       JMP  LOOP
+ STEP:      7""",
+    "counted loop that overflows": """START: LDA# 0
+ LOOP: CMP# 1
+       BEQ  DONE
+       ADD  STEP
+       JMP  LOOP
+ DONE: HLT
+ STEP:      2""",
+    "step limit": """START: LDA# 1
+ LOOP: CMP# 0
+       BEQ  DONE
+       ADD  STEP
+       JMP  LOOP
+ DONE: HLT
+ STEP:      0""",
+    "nested loops": """START: LDA# 0
+       STA  I
+OUTER: LDA  I
+       CMP# 30
+       BEQ  DONE
+       ADD  ONE
+       STA  I
+       LDA# 0
+INNER: CMP# 120
+       BEQ  OUTER
+       ADD  ONE
+       JMP  INNER
+ DONE: HLT
+    I:      0
+  ONE:      1""",
+    "data cell inside a loop": """ LOOP: ADD  NUM1
+ TEMP:      0
+       CMP# 100
+       BEQ  DONE
+       JMP  LOOP
+ DONE: HLT
+ NUM1:      1""",
+    "subroutine in a loop": """START: LDA# 0
+ LOOP: JSR  INC
+       CMP# 90
+       BEQ  DONE
+       JMP  LOOP
+ DONE: HLT
+  INC: ADD  ONE
+       RTN
+  ONE:      1""",
+    "load add store loop": """START: LDA  LOW
+ LOOP: CMP# 120
+       BEQ  DONE
+       LDA  CNT
+       ADD  ONE
+       STA  CNT
+       JMP  LOOP
+ DONE: HLT
+  LOW:      -128
+  CNT:      -128
+  ONE:      1""",
+    "branch into a fused sequence": """START: LDA  A
+       ADD  B
+  MID: STA  C
+       LDA  C
+       CMP# 20
+       BEQ  END
+       JMP  MID
+  END: HLT
+    A:      1
+    B:      2
+    C:      0""",
+    "self-modifying loop": """START: LDA# 0
+ LOOP: ADD  SEL
+       CMP# 50
+       BEQ  PATCH
+       JMP  LOOP
+PATCH: LDA  NEWV
+       STA  LOOP
+       LDA# 0
+       JMP  LOOP
+ DONE: HLT
+  SEL:      1
+ NEWV:      3""",
+    "STA rewrites the operand of a STA": """START: LDA  TGT
+       STA  P
+       LDA# 5
+    P: STA  JUNK
+       LDA# 5
+    C: CMP# 0
+       BEQ  YES
+       LDA# 1
+       HLT
+  YES: LDA# 2
+       HLT
+  TGT:      6
+ JUNK:      0""",
+    "arithmetic address out of range": """START: LDA  X
+       ADD  25
+       STA  X
+       HLT
+    X:      1""",
+}
+
+
+def AssembleText(Text):
+    SourceCode = Skeleton.ReadSourceText(Skeleton.CreateSourceCode(), Text)
+    return SourceCode, Skeleton.Assemble(SourceCode, Skeleton.CreateMemory())
+
+
+def AssembleFile(FileName):
+    SourceCode = Skeleton.ReadSourceFile(Skeleton.CreateSourceCode(), FileName)
+    return SourceCode, Skeleton.Assemble(SourceCode, Skeleton.CreateMemory())
+
+
+def GetResult(Memory, Registers, StepCount):
+    return list(Registers), [Cell.OperandValue for Cell in Memory], StepCount
+
+
+class EngineTests(unittest.TestCase):
+    def setUp(self):
+        self.PreviousSink = Skeleton.SetOutputSink(NullSink())
+        self.ExportDirectory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        Skeleton.SetOutputSink(self.PreviousSink)
+        self.ExportDirectory.cleanup()
+
+    def CompareEngines(self, Name, SourceCode, Memory):
+        self.assertNotEqual(Memory[0].OpCode, "ERR", Name)
+        Expected = GetResult(*Skeleton.ExecuteHeadless(Skeleton.CopyMemory(Memory)))
+        for Engine in ENGINES:
+            with self.subTest(Name, Engine=Engine.__name__):
+                self.assertEqual(GetResult(*Engine(Skeleton.CopyMemory(Memory))), Expected)
+        try:
+            Program = aot_export.LoadProgram(SourceCode, Memory, self.ExportDirectory.name)
+        except ValueError:
+            return
+        Registers, Values, StepCount = Expected
+        FinalState = Program.run()
+        with self.subTest(Name, Engine="aot_export"):
+            if Registers[Skeleton.ERR] == Skeleton.ERROR_STEP_LIMIT:
+                # exported modules check the step limit at basic block boundaries
+                self.assertEqual(FinalState["registers"][Skeleton.ERR], Skeleton.ERROR_STEP_LIMIT)
+            else:
+                self.assertEqual(FinalState["registers"], Registers)
+                self.assertEqual(FinalState["memory"], Values)
+                self.assertEqual(FinalState["steps"], StepCount)
+
+    def test_program_files(self):
+        for FileName in PROGRAM_FILES:
+            self.CompareEngines(FileName, *AssembleFile(FileName))
+
+    def test_programs(self):
+        for Name in PROGRAMS:
+            self.CompareEngines(Name, *AssembleText(PROGRAMS[Name]))
+
+    def test_step_limits(self):
+        for Name in STEP_LIMIT_PROGRAMS:
+            SourceCode, Memory = AssembleText(PROGRAMS[Name])
+            for StepLimit in STEP_LIMITS:
+                Expected = GetResult(*Skeleton.ExecuteHeadless(Skeleton.CopyMemory(Memory), StepLimit))
+                for Engine in ENGINES:
+                    with self.subTest(Name, StepLimit=StepLimit, Engine=Engine.__name__):
+                        self.assertEqual(GetResult(*Engine(Skeleton.CopyMemory(Memory), StepLimit)), Expected)
+
+    def test_export_of_optimised_image(self):
+        SourceCode, Memory = AssembleFile("prog2")
+        Optimised = peephole.OptimiseProgram(SourceCode, Memory)
+        Original = aot_export.LoadProgram(SourceCode, Memory, self.ExportDirectory.name)
+        Program = aot_export.LoadProgram(SourceCode, Optimised.Memory, self.ExportDirectory.name)
+        self.assertNotEqual(Program.__file__, Original.__file__)
+        Expected = Skeleton.ExecuteHeadless(Skeleton.CopyMemory(Optimised.Memory))
+        self.assertEqual(Program.run()["steps"], Expected[2])
+
+    def test_self_modifying_programs_are_not_fused(self):
+        SourceCode, Memory = AssembleText(PROGRAMS["STA rewrites the operand of a STA"])
+        self.assertEqual(fast_engine.CreateFusionPlan(Memory), [None] * len(Memory))
+
+
+if __name__ == "__main__":
+    unittest.main()
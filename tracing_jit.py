@@ -0,0 +1,190 @@
+# Tracing JIT for the headless loop of the AQA AS 2023 skeleton program
+# counts taken backward JMP/branch targets; once a target is hot the next pass round the loop
+# is recorded and compiled with exec into a Python function that repeats the loop body with
+# guards on every branch and error, until a guard fails or the step budget runs out
+
+import sys
+import time
+
+import Paper1_AS_2023_PYTHON3_Pub_0_0_0 as Skeleton
+from output_sink import NullSink
+
+HOT_THRESHOLD = 20
+MAX_TRACE_LENGTH = 64
+
+PC = Skeleton.PC
+ACC = Skeleton.ACC
+STATUS = Skeleton.STATUS
+ERR = Skeleton.ERR
+
+
+def IsTraceable(Trace, MemorySize):
+    for Address, OpCode, Operand, NextPc in Trace:
+        Definition = Skeleton.OPCODES.get(OpCode)
+        if Definition is None or Definition.Flow in (Skeleton.FLOW_CALL, Skeleton.FLOW_RETURN, Skeleton.FLOW_HALT):
+            return False
+        if Definition.AddressMode == Skeleton.ADDRESS_DIRECT and not 0 <= Operand < MemorySize:
+            return False
+    return True
+
+
+def CreateTraceSource(Trace):
+    Lines = ["def RunTrace(Memory, Registers, StepsLeft):",
+             "    Steps = 0",
+             "    while StepsLeft - Steps >= {}:".format(len(Trace))]
+    for Index in range(len(Trace)):
+        Address, OpCode, Operand, NextPc = Trace[Index]
+        Exit = "            return Steps + {}".format(Index + 1)
+        if OpCode != "JMP":
+            Lines.append("        Registers[{}] = {}".format(PC, Address + 1))
+        if OpCode == "LDA":
+            Lines.append("        Registers[{}] = Memory[{}].OperandValue".format(ACC, Operand))
+            Lines.append("        SetFlags(Registers[{}], Registers)".format(ACC))
+        elif OpCode == "LDA#":
+            Lines.append("        Registers[{}] = {}".format(ACC, Operand))
+            Lines.append("        SetFlags(Registers[{}], Registers)".format(ACC))
+        elif OpCode == "STA":
+            Lines.append("        Memory[{}].OperandValue = Registers[{}]".format(Operand, ACC))
+        elif OpCode == "CMP#":
+            Lines.append("        SetFlags(Registers[{}] - {}, Registers)".format(ACC, Operand))
+        elif OpCode == "ADD" or OpCode == "SUB":
+            Sign = "+" if OpCode == "ADD" else "-"
+            Lines.append("        SetArithmeticResult(Registers[{}] {} Memory[{}].OperandValue, Registers)".format(
+                ACC, Sign, Operand))
+            Lines.append("        if Registers[{}]:".format(ERR))
+            Lines.append(Exit)
+        elif OpCode == "JMP":
+            Lines.append("        Registers[{}] = {}".format(PC, Operand))
+        elif OpCode == "BEQ":
+            if NextPc == Operand:
+                Lines.append("        if not Registers[{}] & {}:".format(STATUS, Skeleton.FLAG_Z))
+                Lines.append(Exit)
+                Lines.append("        Registers[{}] = {}".format(PC, Operand))
+            else:
+                Lines.append("        if Registers[{}] & {}:".format(STATUS, Skeleton.FLAG_Z))
+                Lines.append("            Registers[{}] = {}".format(PC, Operand))
+                Lines.append(Exit)
+        elif OpCode != "SKP" and Skeleton.OPCODE_HANDLERS.get(OpCode) is not None:
+            Lines.append("        Memory, Registers = Handlers[{!r}](Memory, Registers, {})".format(OpCode, Operand))
+            Lines.append("        if Registers[{}] or Registers[{}] != {}:".format(ERR, PC, NextPc))
+            Lines.append(Exit)
+    Lines.append("        Steps += {}".format(len(Trace)))
+    Lines.append("    return Steps")
+    return "\n".join(Lines) + "\n"
+
+
+def CompileTrace(Head, Trace):
+    Namespace = {"SetFlags": Skeleton.SetFlags, "SetArithmeticResult": Skeleton.SetArithmeticResult,
+                 "Handlers": dict(Skeleton.OPCODE_HANDLERS)}
+    exec(compile(CreateTraceSource(Trace), "<trace at line {}>".format(Head), "exec"), Namespace)
+    return Namespace["RunTrace"]
+
+
+class TracingJit:
+    def __init__(self, Threshold=HOT_THRESHOLD, MaxTraceLength=MAX_TRACE_LENGTH):
+        self.Threshold = Threshold
+        self.MaxTraceLength = MaxTraceLength
+        self.Counters = {}
+        self.Traces = {}
+        self.TraceCells = {}
+        self.TraceWrites = set()
+        self.Rejected = set()
+        self.Recording = None
+        self.RecordingHead = None
+
+    def Invalidate(self, Address):
+        for Head in list(self.TraceCells.get(Address, ())):
+            del self.Traces[Head]
+            self.Counters[Head] = 0
+            for Cells in self.TraceCells.values():
+                Cells.discard(Head)
+
+    def FinishRecording(self, MemorySize):
+        Head = self.RecordingHead
+        Trace = self.Recording
+        self.Recording = None
+        Addresses = set(Address for Address, OpCode, Operand, NextPc in Trace)
+        Writes = set(Operand for Address, OpCode, Operand, NextPc in Trace if OpCode == "STA")
+        Overlaps = Writes & Addresses or Writes & set(self.TraceCells) or Addresses & self.TraceWrites
+        if Overlaps or not IsTraceable(Trace, MemorySize):
+            self.Rejected.add(Head)
+            return
+        self.Traces[Head] = CompileTrace(Head, Trace)
+        self.TraceWrites |= Writes
+        for Address in Addresses:
+            self.TraceCells.setdefault(Address, set()).add(Head)
+
+    def Record(self, Address, OpCode, Operand, NextPc, Registers, MemorySize):
+        self.Recording.append((Address, OpCode, Operand, NextPc))
+        if Registers[ERR] != 0 or len(self.Recording) > self.MaxTraceLength:
+            self.Rejected.add(self.RecordingHead)
+            self.Recording = None
+        elif NextPc == self.RecordingHead:
+            self.FinishRecording(MemorySize)
+
+    def CountBackwardBranch(self, Target):
+        if Target in self.Traces or Target in self.Rejected:
+            return
+        self.Counters[Target] = self.Counters.get(Target, 0) + 1
+        if self.Counters[Target] >= self.Threshold:
+            self.Recording = []
+            self.RecordingHead = Target
+
+    def Run(self, Memory, Registers, MaxSteps):
+        Handlers = Skeleton.OPCODE_HANDLERS
+        BranchOpCodes = set(Mnemonic for Mnemonic in Skeleton.OPCODES
+                            if Skeleton.OPCODES[Mnemonic].Flow in (Skeleton.FLOW_JUMP, Skeleton.FLOW_BRANCH))
+        Traces = self.Traces
+        StepCount = 0
+        try:
+            while Registers[ERR] == 0 and StepCount < MaxSteps:
+                Address = Registers[PC]
+                if Address in Traces and self.Recording is None:
+                    Steps = Traces[Address](Memory, Registers, MaxSteps - StepCount)
+                    if Steps > 0:
+                        StepCount += Steps
+                        continue
+                Cell = Memory[Address]
+                OpCode = Cell.OpCode
+                if OpCode == "HLT":
+                    break
+                Operand = Cell.OperandValue
+                Registers[PC] = Address + 1
+                Handler = Handlers.get(OpCode)
+                if Handler is not None:
+                    Memory, Registers = Handler(Memory, Registers, Operand)
+                StepCount += 1
+                if self.Recording is not None:
+                    self.Record(Address, OpCode, Operand, Registers[PC], Registers, len(Memory))
+                elif OpCode in BranchOpCodes and Registers[PC] <= Address:
+                    self.CountBackwardBranch(Registers[PC])
+                if OpCode == "STA" and Operand in self.TraceCells:
+                    self.Invalidate(Operand)
+        except IndexError:
+            Registers = Skeleton.ReportRunTimeError("Address out of range", Registers, Skeleton.ERROR_ADDRESS)
+        return Memory, Registers, StepCount
+
+
+def ExecuteHeadlessTraced(Memory, StepLimit=Skeleton.STEP_LIMIT, Jit=None):
+    if Jit is None:
+        Jit = TracingJit()
+    Registers = Skeleton.ResetRegisters(Memory)
+    Memory, Registers, StepCount = Jit.Run(Memory, Registers, StepLimit)
+    if Registers[ERR] == 0 and Memory[Registers[PC]].OpCode != "HLT":
+        Registers = Skeleton.ReportRunTimeError("Step limit reached", Registers, Skeleton.ERROR_STEP_LIMIT)
+    return Memory, Registers, StepCount
+
+
+if __name__ == "__main__":
+    SourceCode, Memory, SymbolTable = Skeleton.LoadAndAssemble(sys.argv[1])
+    if Memory[0].OpCode != "ERR":
+        Results = []
+        for Engine in (Skeleton.ExecuteHeadless, ExecuteHeadlessTraced):
+            PreviousSink = Skeleton.SetOutputSink(NullSink())
+            StartTime = time.perf_counter()
+            Final, Registers, StepCount = Engine(Skeleton.CopyMemory(Memory))
+            Time = time.perf_counter() - StartTime
+            Skeleton.SetOutputSink(PreviousSink)
+            Results.append((Registers, StepCount, [Cell.OperandValue for Cell in Final]))
+            Skeleton.Output.Print("{:<22s} {:.4f}s  steps: {}".format(Engine.__name__, Time, StepCount))
+        Skeleton.Output.Print("Results match:", Results[0] == Results[1])